@@ -1,7 +1,15 @@
+import contextvars
 import json
+from concurrent.futures import ThreadPoolExecutor
 from app.chat_gemini import GeminiChat
-from app.schemas import GameInterface, GameEvent, EventType
-from typing import Dict, Any
+from app.schemas import GameInterface, GameEvent, EventType, EventDescriptionBatch
+from app.tracing import tracer
+from typing import Dict, Any, List, Tuple
+
+# Maksymalna liczba wydarzeń opisywanych w jednym zapytaniu do AI
+MAX_DESCRIBE_BATCH = 10
+# Ile paczek może być przetwarzanych równolegle
+MAX_BATCH_WORKERS = 4
 
 class AIEventGenerator:
     def __init__(self):
@@ -11,7 +19,32 @@ class AIEventGenerator:
         """
         Generuje opis wydarzenia używając AI na podstawie wydarzenia i stanu gry.
         """
-        prompt = f"""
+        prompt = self._description_prompt(event, game_state)
+        with tracer.span("ai.generate_event_description", event_name=event.name, prompt_chars=len(prompt)) as span:
+            try:
+                description = self.gemini.message(prompt, route="events.describe")
+                return description.strip()
+            except Exception as e:
+                # Fallback do oryginalnego opisu w przypadku błędu AI
+                span.set_attribute("fallback", True)
+                return event.description
+
+    async def agenerate_event_description(self, event: GameEvent, game_state: GameInterface) -> str:
+        """
+        Wersja async generate_event_description - anulowanie zadania przerywa
+        zapytanie do AI (praca w tle kanału WebSocket).
+        """
+        prompt = self._description_prompt(event, game_state)
+        with tracer.span("ai.generate_event_description", event_name=event.name, prompt_chars=len(prompt)) as span:
+            try:
+                description = await self.gemini.amessage(prompt, route="events.describe")
+                return description.strip()
+            except Exception:
+                span.set_attribute("fallback", True)
+                return event.description
+
+    def _description_prompt(self, event: GameEvent, game_state: GameInterface) -> str:
+        return f"""
         Jesteś narratorem gry symulującej życie. 
         
         Wydarzenie: {event.name}
@@ -29,13 +62,63 @@ class AIEventGenerator:
         Wygeneruj krótki, angażujący opis tego wydarzenia (2-3 zdania) w stylu narracyjnym.
         Opis powinien być realistyczny i pasować do aktualnego stanu gry.
         """
-        
-        try:
-            description = self.gemini.message(prompt)
-            return description.strip()
-        except Exception as e:
-            # Fallback do oryginalnego opisu w przypadku błędu AI
-            return event.description
+
+    def generate_event_descriptions_batch(self, items: List[Tuple[GameEvent, GameInterface]]) -> List[str]:
+        """
+        Generuje opisy wielu wydarzeń naraz - jedno zapytanie do AI na paczkę
+        (maks. MAX_DESCRIBE_BATCH wydarzeń). Zwraca opisy w kolejności wejścia.
+        """
+        chunks = [items[i:i + MAX_DESCRIBE_BATCH] for i in range(0, len(items), MAX_DESCRIBE_BATCH)]
+        if len(chunks) <= 1:
+            return self._describe_chunk(chunks[0]) if chunks else []
+
+        # Każda paczka dostaje kopię kontekstu (bieżący span, profil) - wątki puli go nie dziedziczą
+        with ThreadPoolExecutor(max_workers=min(MAX_BATCH_WORKERS, len(chunks))) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._describe_chunk, chunk)
+                for chunk in chunks
+            ]
+        return [description for future in futures for description in future.result()]
+
+    def _describe_chunk(self, items: List[Tuple[GameEvent, GameInterface]]) -> List[str]:
+        """Opisuje jedną paczkę wydarzeń w jednym zapytaniu (structured output)."""
+        entries = []
+        for index, (event, game_state) in enumerate(items):
+            entries.append(f"""
+        [{index}]
+        Wydarzenie: {event.name}
+        Typ: {event.type}
+        Opis bazowy: {event.description}
+        Efekty: {event.effects}
+        Stan gry: zdrowie={game_state.health}, finanse={game_state.money}, relacje={game_state.relations}, dochód pasywny={game_state.passive_income}, satysfakcja={game_state.satisfaction}
+        """)
+
+        prompt = f"""
+        Jesteś narratorem gry symulującej życie.
+
+        Poniżej znajduje się lista {len(items)} wydarzeń, każde z własnym stanem gry.
+        {"".join(entries)}
+
+        Dla KAŻDEGO wydarzenia wygeneruj krótki, angażujący opis (2-3 zdania) w stylu narracyjnym.
+        Opis powinien być realistyczny i pasować do stanu gry danego wydarzenia.
+        Zwróć listę "descriptions", w której "index" odpowiada numerowi wydarzenia w nawiasach kwadratowych.
+        """
+
+        # Domyślnie każdy element dostaje oryginalny opis
+        descriptions = [event.description for event, _ in items]
+        with tracer.span("ai.describe_batch_chunk", batch_size=len(items), prompt_chars=len(prompt)) as span:
+            try:
+                response = self.gemini.message(prompt, response_schema=EventDescriptionBatch, route="events.describe_batch")
+                batch = EventDescriptionBatch.model_validate_json(response)
+            except Exception as e:
+                print(f"Error generating AI descriptions batch: {e}")
+                span.set_attribute("fallback", True)
+                return descriptions
+
+        for item in batch.descriptions:
+            if 0 <= item.index < len(items) and item.description.strip():
+                descriptions[item.index] = item.description.strip()
+        return descriptions
 
     def generate_event_variation(self, base_event: Dict[str, Any], game_state: GameInterface) -> Dict[str, Any]:
         """
@@ -60,7 +143,7 @@ class AIEventGenerator:
         """
         
         try:
-            response = self.gemini.message(prompt)
+            response = self.gemini.message(prompt, route="events.variation")
             # Spróbuj wyciągnąć JSON z odpowiedzi
             if "{" in response and "}" in response:
                 json_start = response.find("{")
@@ -106,7 +189,7 @@ class AIEventGenerator:
         """
         
         try:
-            response = self.gemini.message(prompt)
+            response = self.gemini.message(prompt, route="events.generate")
             if "{" in response and "}" in response:
                 json_start = response.find("{")
                 json_end = response.rfind("}") + 1
@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.schemas import GameSummaryRequest
+from app.summary_service import SummaryService
+
+# Ile razy ponawiamy podsumowanie po błędzie modelu
+MAX_RETRIES = 2
+
+
+def _summarize(service: SummaryService, line_no: int, line: str) -> Dict[str, Any]:
+    """Podsumowuje jedną grę z archiwum; błędy trafiają do rekordu wyjściowego."""
+    record: Dict[str, Any] = {"line": line_no}
+    try:
+        data = json.loads(line)
+        record["id"] = data.get("game_id") or data.get("id")
+        request = GameSummaryRequest.model_validate(data)
+        if request.history is None:
+            raise ValueError("history is required in archived games")
+    except Exception as e:
+        record["error"] = f"invalid input: {e}"
+        return record
+
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            record["summary"] = service.getGameSummary(request).summary
+            return record
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                record["error"] = str(e)
+                return record
+            time.sleep(2 ** attempt)
+    return record
+
+
+class Checkpoint:
+    """
+    Stan postępu: liczba przetworzonych linii wejścia i długość pliku wyjściowego.
+    Wyniki zapisywane są w kolejności wejścia, więc to wystarcza do wznowienia.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lines_done = 0
+        self.output_bytes = 0
+        if path.exists():
+            data = json.loads(path.read_text())
+            self.lines_done = data["lines_done"]
+            self.output_bytes = data["output_bytes"]
+
+    def save(self, lines_done: int, output_bytes: int) -> None:
+        self.lines_done = lines_done
+        self.output_bytes = output_bytes
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps({"lines_done": lines_done, "output_bytes": output_bytes}))
+        os.replace(tmp_path, self.path)
+
+
+def run_batch(input_path: Path, output_path: Path, concurrency: int = 8,
+              checkpoint_path: Optional[Path] = None, checkpoint_every: int = 20,
+              report_every: float = 10.0) -> Dict[str, Any]:
+    """
+    Strumieniowo czyta archiwum JSONL, podsumowuje gry z ograniczoną
+    współbieżnością i dopisuje wyniki do pliku wyjściowego. Pamięć jest
+    stała: w locie jest najwyżej kilka okien po `concurrency` gier.
+    """
+    checkpoint = Checkpoint(checkpoint_path or output_path.with_name(output_path.name + ".checkpoint"))
+    service = SummaryService()
+    window = concurrency * 4
+    pending: Deque[Tuple[int, Future]] = deque()
+    stats = {"processed": 0, "errors": 0, "skipped": checkpoint.lines_done}
+    started = last_report = time.monotonic()
+
+    if checkpoint.lines_done:
+        print(f"Wznawianie od linii {checkpoint.lines_done + 1}")
+
+    with open(output_path, "ab") as out, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Odrzucamy wyniki zapisane po ostatnim checkpoincie; pozycja pliku musi
+        # wskazywać nowy koniec, inaczej tell() zapisze w checkpoincie stary rozmiar
+        out.truncate(checkpoint.output_bytes)
+        out.seek(0, os.SEEK_END)
+
+        def flush_one() -> None:
+            nonlocal last_report
+            line_no, future = pending.popleft()
+            record = future.result()
+            if record is not None:
+                out.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                stats["processed"] += 1
+                stats["errors"] += "error" in record
+            if line_no % checkpoint_every == 0:
+                out.flush()
+                checkpoint.save(line_no, out.tell())
+
+            now = time.monotonic()
+            if now - last_report >= report_every:
+                last_report = now
+                rate = stats["processed"] / (now - started)
+                print(f"Przetworzono {stats['processed']} gier ({rate:.2f}/s), błędy: {stats['errors']}")
+
+        line_no = 0
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if line_no <= checkpoint.lines_done:
+                    continue
+                if line.strip():
+                    future = executor.submit(_summarize, service, line_no, line)
+                else:
+                    future = Future()
+                    future.set_result(None)
+                pending.append((line_no, future))
+                if len(pending) >= window:
+                    flush_one()
+
+        while pending:
+            flush_one()
+        out.flush()
+        checkpoint.save(max(line_no, checkpoint.lines_done), out.tell())
+
+    elapsed = time.monotonic() - started
+    stats["elapsed_s"] = round(elapsed, 2)
+    stats["throughput_per_s"] = round(stats["processed"] / elapsed, 3) if elapsed else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hurtowe podsumowania gier z archiwum JSONL")
+    parser.add_argument("input", type=Path, help="plik JSONL z grami (GameSummaryRequest w każdej linii)")
+    parser.add_argument("output", type=Path, help="plik JSONL z podsumowaniami")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--checkpoint", type=Path, default=None)
+    parser.add_argument("--report-every", type=float, default=10.0)
+    args = parser.parse_args()
+
+    result = run_batch(args.input, args.output, args.concurrency, args.checkpoint, report_every=args.report_every)
+    print(f"Gotowe: {result}")
@@ -0,0 +1,71 @@
+import asyncio
+import os
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException, Request, status
+
+from app.metrics import metrics
+
+T = TypeVar("T")
+
+# Domyślny limit czasu requestu czekającego na model (sekundy)
+REQUEST_TIMEOUT_S = float(os.getenv("REQUEST_TIMEOUT_S", "60"))
+
+# Status zwracany gdy klient zamknął połączenie (konwencja nginx)
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    """Czeka na komunikat http.disconnect (treść requestu jest już wczytana)."""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_cancellable(request: Optional[Request], work: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Wykonuje pracę (np. zapytanie do modelu) i przerywa ją, gdy klient się
+    rozłączy albo minie limit czasu. Anulowanie zadania zamyka połączenie
+    do upstreamu, więc nie blokuje ani wątku, ani limitu zapytań.
+    Bez requestu HTTP (np. WebSocket) pilnowany jest tylko limit czasu.
+    """
+    task = asyncio.ensure_future(work)
+    waiters = {task}
+    disconnect = None
+    if request is not None:
+        disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+        waiters.add(disconnect)
+
+    try:
+        done, _ = await asyncio.wait(
+            waiters,
+            timeout=timeout if timeout is not None else REQUEST_TIMEOUT_S,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+    except asyncio.CancelledError:
+        # Serwer sam anuluje obsługę requestu - nie zostawiamy pracy w tle
+        task.cancel()
+        metrics.inc("cancellation.server_cancelled")
+        raise
+    finally:
+        if disconnect is not None:
+            disconnect.cancel()
+
+    if task in done:
+        return task.result()
+
+    reason = "client_disconnected" if disconnect in done else "deadline_exceeded"
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+    metrics.inc(f"cancellation.{reason}")
+
+    if reason == "client_disconnected":
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    raise HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail="Upstream model did not respond in time"
+    )
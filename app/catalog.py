@@ -0,0 +1,210 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Set, Tuple, Union
+
+EVENTS_FILE = Path(__file__).parent / "events/event.json"
+CATALOG_FILE = Path(__file__).parent / "events/event.catalog"
+
+MAGIC = b"EVCAT\x00\x00\x01"
+EFFECT_NAMES = ("money", "health", "relations", "satisfaction", "passive_income")
+EVENT_TYPES = ("positive", "negative")
+
+# Nagłówek: magic, liczba wydarzeń, offset tablicy warunków, offset puli napisów
+HEADER = struct.Struct("<8sIII")
+# Wydarzenie: nazwa (off, len), opis (off, len), typ, chance, 5 efektów, warunki (pierwszy, liczba)
+EVENT = struct.Struct("<IIIIBd5qII")
+# Warunek: statystyka (off, len), rodzaj, flagi min/max, min, max, napis (off, len)
+CONDITION = struct.Struct("<IIBBqqII")
+
+COND_RANGE, COND_BOOL, COND_STR = 0, 1, 2
+HAS_MIN, HAS_MAX = 1, 2
+
+
+class CompiledCatalog(Sequence):
+    """
+    Skompilowany katalog wydarzeń mapowany w pamięci tylko do odczytu.
+    Rekordy (opisy, efekty) leżą tylko w stronach pliku współdzielonych przez
+    workery i są dekodowane do słowników (jak w event.json) przy każdym
+    dostępie - czyli tylko dla wybranego wydarzenia lub listy dostępnych.
+    Do sprawdzania warunków i losowania worker trzyma mały indeks:
+    nazwę, szansę i warunki każdego wydarzenia jako krotki.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._conditions_offset, self._strings_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a compiled event catalog: {self.path}")
+        # (nazwa, szansa, ((statystyka, rodzaj, flagi, min, max, napis), ...)) dla każdego wydarzenia
+        self._index: Tuple[Tuple[str, float, Tuple[tuple, ...]], ...] = tuple(
+            self._index_entry(index) for index in range(self._count)
+        )
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self._decode(index)
+
+    def chances(self) -> List[float]:
+        return [chance for _, chance, _ in self._index]
+
+    def is_eligible(self, index: int, game_state: Any, excluded: Set[str]) -> bool:
+        """
+        Odpowiednik EventService._check_conditions liczony na indeksie -
+        bez dekodowania rekordu; pomija wydarzenia o nazwach z excluded.
+        """
+        name, _, conditions = self._index[index]
+        if name in excluded:
+            return False
+        for stat, kind, flags, min_value, max_value, text in conditions:
+            value = getattr(game_state, stat, None)
+            if kind == COND_RANGE:
+                if value is None:
+                    continue
+                if flags & HAS_MAX and value > max_value or flags & HAS_MIN and value < min_value:
+                    return False
+            elif kind == COND_BOOL:
+                if value != bool(min_value):
+                    return False
+            elif str(value).lower() != text:
+                return False
+        return True
+
+    def _index_entry(self, index: int) -> Tuple[str, float, Tuple[tuple, ...]]:
+        name_off, name_len, _, _, _, chance, *_, cond_first, cond_count = EVENT.unpack_from(
+            self._mm, HEADER.size + index * EVENT.size
+        )
+        conditions = []
+        for c in range(cond_first, cond_first + cond_count):
+            stat_off, stat_len, kind, flags, min_value, max_value, str_off, str_len = CONDITION.unpack_from(
+                self._mm, self._conditions_offset + c * CONDITION.size
+            )
+            text = self._string(str_off, str_len).lower() if kind == COND_STR else None
+            conditions.append((self._string(stat_off, stat_len), kind, flags, min_value, max_value, text))
+        return self._string(name_off, name_len), chance, tuple(conditions)
+
+    def _decode(self, index: int) -> Dict[str, Any]:
+        (name_off, name_len, desc_off, desc_len, event_type, chance,
+         *effects, cond_first, cond_count) = EVENT.unpack_from(self._mm, HEADER.size + index * EVENT.size)
+
+        conditions = {}
+        for c in range(cond_first, cond_first + cond_count):
+            stat_off, stat_len, kind, flags, min_value, max_value, str_off, str_len = CONDITION.unpack_from(
+                self._mm, self._conditions_offset + c * CONDITION.size
+            )
+            stat = self._string(stat_off, stat_len)
+            if kind == COND_BOOL:
+                conditions[stat] = bool(min_value)
+            elif kind == COND_STR:
+                conditions[stat] = self._string(str_off, str_len)
+            else:
+                limits = {}
+                if flags & HAS_MIN:
+                    limits["min"] = min_value
+                if flags & HAS_MAX:
+                    limits["max"] = max_value
+                conditions[stat] = limits
+
+        return {
+            "name": self._string(name_off, name_len),
+            "type": EVENT_TYPES[event_type],
+            "description": self._string(desc_off, desc_len),
+            "conditions": conditions,
+            "effects": dict(zip(EFFECT_NAMES, effects)),
+            "chance": chance,
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self._count):
+            yield self[index]
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+
+def compile_catalog(events: List[Dict[str, Any]], path: Path) -> None:
+    """Zapisuje listę wydarzeń (format event.json) jako skompilowany katalog."""
+    strings = bytearray()
+    string_offsets: Dict[str, int] = {}
+
+    def add_string(value: str):
+        data = value.encode("utf-8")
+        if value not in string_offsets:
+            string_offsets[value] = len(strings)
+            strings.extend(data)
+        return string_offsets[value], len(data)
+
+    event_records = bytearray()
+    condition_records = bytearray()
+    condition_count = 0
+    for event in events:
+        cond_first = condition_count
+        for stat, limits in event.get("conditions", {}).items():
+            stat_ref = add_string(stat)
+            if isinstance(limits, bool):
+                record = (*stat_ref, COND_BOOL, 0, int(limits), 0, 0, 0)
+            elif isinstance(limits, str):
+                record = (*stat_ref, COND_STR, 0, 0, 0, *add_string(limits))
+            else:
+                flags = (HAS_MIN if "min" in limits else 0) | (HAS_MAX if "max" in limits else 0)
+                record = (*stat_ref, COND_RANGE, flags, limits.get("min", 0), limits.get("max", 0), 0, 0)
+            condition_records.extend(CONDITION.pack(*record))
+            condition_count += 1
+
+        effects = [event["effects"].get(name, 0) for name in EFFECT_NAMES]
+        event_records.extend(EVENT.pack(
+            *add_string(event["name"]),
+            *add_string(event["description"]),
+            EVENT_TYPES.index(event["type"]),
+            float(event.get("chance", 0)),
+            *effects,
+            cond_first,
+            condition_count - cond_first,
+        ))
+
+    conditions_offset = HEADER.size + len(event_records)
+    strings_offset = conditions_offset + len(condition_records)
+    tmp_path = Path(path).with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(events), conditions_offset, strings_offset))
+        f.write(event_records)
+        f.write(condition_records)
+        f.write(strings)
+    # Podmiana atomowa - działające workery zachowują stary plik zmapowany
+    os.replace(tmp_path, path)
+
+
+def load_events(json_path: Path = EVENTS_FILE, catalog_path: Path = CATALOG_FILE) -> Union[CompiledCatalog, List[Dict[str, Any]]]:
+    """
+    Zwraca katalog wydarzeń: skompilowany (mmap), jeśli jest aktualny,
+    w przeciwnym razie sparsowany event.json.
+    """
+    catalog_path = Path(os.getenv("EVENT_CATALOG", catalog_path))
+    if catalog_path.exists() and catalog_path.stat().st_mtime >= json_path.stat().st_mtime:
+        return CompiledCatalog(catalog_path)
+    with open(json_path, "r") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kompiluje event.json do binarnego katalogu mapowanego w pamięci")
+    parser.add_argument("--input", type=Path, default=EVENTS_FILE)
+    parser.add_argument("--output", type=Path, default=CATALOG_FILE)
+    args = parser.parse_args()
+
+    with open(args.input, "r") as f:
+        source_events = json.load(f)
+    compile_catalog(source_events, args.output)
+    print(f"Skompilowano {len(source_events)} wydarzeń do {args.output}")
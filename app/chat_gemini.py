@@ -1,26 +1,151 @@
 import os
+import time
+from typing import Iterator, List, Tuple
 from dotenv import load_dotenv
 from google import genai
 from google.genai.types import GenerateContentConfig, HttpOptions
+from app.gemini_replay import get_recorder, get_replay_backend, prompt_hash
+from app.model_router import LOCAL_MODEL, TIERS, LocalModelFallback, model_router
+from app.tracing import tracer
 
 class GeminiChat:
-    def __init__(self, model_name="gemini-2.5-flash-lite"):
+    def __init__(self, model_name=None):
         # Load environment variables
         load_dotenv()
+        # GEMINI_RECORD_PATH logs every call to JSONL; GEMINI_REPLAY_PATH serves such a log instead of the API
+        record_path = os.getenv("GEMINI_RECORD_PATH")
+        replay_path = os.getenv("GEMINI_REPLAY_PATH")
+        self.recorder = get_recorder(record_path) if record_path else None
+        self.replay = get_replay_backend(replay_path) if replay_path else None
+
         self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
+        if self.replay is not None:
+            # Replay needs no network and no API key
+            self.client = None
+        elif not self.api_key:
             raise ValueError("API key not found. Please set GEMINI_API_KEY in your .env file.")
-        
-        # Initialize the Gemini client
-        self.client = genai.Client(api_key=self.api_key)
-        self.model_name = model_name
+        else:
+            # Initialize the Gemini client
+            self.client = genai.Client(api_key=self.api_key)
+        # An explicit model_name pins the model; otherwise calls are routed per endpoint
+        self.pinned = model_name is not None
+        self.model_name = model_name or TIERS["fast"]
+
+    def _select(self, route: str = None) -> str:
+        """Picks the model for a call; raises LocalModelFallback when routed to the local stand-in."""
+        if self.pinned or route is None:
+            return self.model_name
+        model = model_router.choose(route)
+        if model == LOCAL_MODEL:
+            raise LocalModelFallback(f"route {route} downgraded to local fallback")
+        return model
+
+    def _config(self, system_prompt: str = None, response_schema=None) -> GenerateContentConfig:
+        """Builds the request config; response_schema turns on structured (JSON) output."""
+        if response_schema is None:
+            return GenerateContentConfig(system_instruction=system_prompt)
+        return GenerateContentConfig(
+            system_instruction=system_prompt,
+            response_mime_type="application/json",
+            response_schema=response_schema,
+        )
+
+    def _span(self, model: str, user_input: str, system_prompt: str = None, response_schema=None,
+              name="gemini.generate_content", route: str = None):
+        return tracer.span(
+            name,
+            model=model,
+            route=route,
+            prompt_chars=len(user_input),
+            system_prompt_chars=len(system_prompt or ""),
+            structured=response_schema is not None,
+        )
 
-    def message(self, user_input: str, system_prompt: str = None) -> str:
-        """Sends a message to Gemini and returns the response."""
+    def message(self, user_input: str, system_prompt: str = None, response_schema=None, route: str = None) -> str:
+        """Sends a message to Gemini and returns the response.
+
+        When response_schema is given the model is asked for JSON matching it
+        (structured output) and the raw JSON text is returned. route names the
+        calling endpoint for model routing (see app.model_router).
+        """
+        model = self._select(route)
+        with self._span(model, user_input, system_prompt, response_schema, route=route) as span, model_router.track(model, route):
+            text = self._generate(model, user_input, system_prompt, response_schema, route)
+            span.set_attribute("response_chars", len(text or ""))
+        # print(text)
+        return text
+
+    async def amessage(self, user_input: str, system_prompt: str = None, response_schema=None, route: str = None) -> str:
+        """Async variant of message(); cancelling the awaiting task aborts the upstream request."""
+        model = self._select(route)
+        with self._span(model, user_input, system_prompt, response_schema, route=route) as span, model_router.track(model, route):
+            key = prompt_hash(user_input, system_prompt, response_schema)
+            if self.replay is not None:
+                text = await self.replay.arespond(key)
+            else:
+                started = time.perf_counter()
+                response = await self.client.aio.models.generate_content(
+                    model=model,
+                    contents=user_input,
+                    config=self._config(system_prompt, response_schema),
+                )
+                text = response.text
+                if self.recorder is not None:
+                    self.recorder.record(key, model, route, user_input, system_prompt, text,
+                                         time.perf_counter() - started)
+            span.set_attribute("response_chars", len(text or ""))
+        return text
+
+    def _generate(self, model: str, contents, system_prompt: str = None, response_schema=None, route: str = None) -> str:
+        """One blocking call: served from the replay log, or sent upstream (and recorded if enabled)."""
+        key = prompt_hash(contents, system_prompt, response_schema)
+        if self.replay is not None:
+            return self.replay.respond(key)
+        started = time.perf_counter()
         response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=user_input,
-            config=GenerateContentConfig(system_instruction=system_prompt),
+            model=model,
+            contents=contents,
+            config=self._config(system_prompt, response_schema),
         )
-        # print(response.text)
+        if self.recorder is not None:
+            self.recorder.record(key, model, route, contents, system_prompt, response.text,
+                                 time.perf_counter() - started)
         return response.text
+
+    @staticmethod
+    def _contents(turns: List[Tuple[str, str]]) -> list:
+        """Converts (role, text) turns - role is "user" or "model" - into Gemini contents."""
+        return [{"role": role, "parts": [{"text": text}]} for role, text in turns]
+
+    def chat(self, turns: List[Tuple[str, str]], system_prompt: str = None, route: str = None) -> str:
+        """Sends a multi-turn conversation (last turn is the new user message) and returns the reply."""
+        model = self._select(route)
+        prompt = "".join(text for _, text in turns)
+        with self._span(model, prompt, system_prompt, name="gemini.chat", route=route) as span, model_router.track(model, route):
+            text = self._generate(model, self._contents(turns), system_prompt, None, route)
+            span.set_attribute("response_chars", len(text or ""))
+        return text
+
+    def stream_chat(self, turns: List[Tuple[str, str]], system_prompt: str = None, route: str = None) -> Iterator[str]:
+        """Like chat(), but yields the reply in chunks as they arrive."""
+        # No tracing span here: the generator is resumed from different threadpool contexts
+        model = self._select(route)
+        contents = self._contents(turns)
+        key = prompt_hash(contents, system_prompt)
+        with model_router.track(model, route):
+            if self.replay is not None:
+                yield from self.replay.stream(key)
+                return
+            started = time.perf_counter()
+            chunks = []
+            for chunk in self.client.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=self._config(system_prompt),
+            ):
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+            if self.recorder is not None:
+                self.recorder.record(key, model, route, contents, system_prompt, "".join(chunks),
+                                     time.perf_counter() - started, chunks=chunks)
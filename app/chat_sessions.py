@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from app.chat_gemini import GeminiChat
+from app.metrics import metrics
+
+CHAT_SYSTEM_PROMPT = """
+Jesteś pomocnym asystentem gry "Architekt Przyszłości" - edukacyjnego symulatora
+decyzji życiowych. Odpowiadaj zwięźle, po polsku.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Zgrubne oszacowanie liczby tokenów (ok. 4 znaki na token)."""
+    return len(text) // 4 + 1
+
+
+class Conversation:
+    """Historia jednej rozmowy: streszczenie starszych tur + ostatnie tury."""
+
+    def __init__(self, conversation_id: str):
+        self.id = conversation_id
+        self.summary = ""
+        self.turns: List[Tuple[str, str]] = []
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        # Trwa streszczanie w tle - kolejne nie jest zlecane
+        self.compacting = False
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(text) for _, text in self.turns)
+
+    def system_prompt(self) -> str:
+        if not self.summary:
+            return CHAT_SYSTEM_PROMPT
+        return f"{CHAT_SYSTEM_PROMPT}\nStreszczenie wcześniejszej części rozmowy:\n{self.summary}"
+
+
+class ChatSessionManager:
+    """
+    Wielu rozmówców, każdy z własną historią po stronie serwera. Historia
+    mieści się w budżecie tokenów - po jego przekroczeniu starsze tury są
+    streszczane w tle, aż ostatnie tury zajmują najwyżej compact_ratio budżetu;
+    nieużywane rozmowy są usuwane (LRU + TTL).
+    """
+
+    def __init__(self, gemini: GeminiChat, token_budget: int = 3000, compact_ratio: float = 0.5,
+                 max_conversations: int = 1000, ttl: float = 1800.0):
+        self.gemini = gemini
+        self.token_budget = token_budget
+        self.compact_ratio = compact_ratio
+        self.max_conversations = max_conversations
+        self.ttl = ttl
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._compactor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-compaction")
+
+    @property
+    def model_name(self) -> str:
+        return self.gemini.model_name
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._conversations)
+
+    def send(self, conversation_id: str, message: str) -> str:
+        """Wysyła wiadomość w ramach rozmowy i zwraca całą odpowiedź."""
+        conversation = self._get(conversation_id)
+        with conversation.lock:
+            reply = self.gemini.chat(conversation.turns + [("user", message)], conversation.system_prompt(), route="chat")
+            self._record(conversation, message, reply)
+        return reply
+
+    def stream(self, conversation_id: str, message: str) -> Iterator[str]:
+        """Wysyła wiadomość i zwraca odpowiedź kawałkami; historia zapisywana po zakończeniu."""
+        conversation = self._get(conversation_id)
+        with conversation.lock:
+            chunks = []
+            for chunk in self.gemini.stream_chat(conversation.turns + [("user", message)], conversation.system_prompt(), route="chat"):
+                chunks.append(chunk)
+                yield chunk
+            self._record(conversation, message, "".join(chunks))
+
+    def clear(self, conversation_id: str) -> bool:
+        with self._lock:
+            return self._conversations.pop(conversation_id, None) is not None
+
+    def _get(self, conversation_id: str) -> Conversation:
+        now = time.monotonic()
+        with self._lock:
+            # Wygasłe rozmowy są na początku kolejki LRU
+            while self._conversations:
+                oldest = next(iter(self._conversations.values()))
+                if now - oldest.last_used <= self.ttl:
+                    break
+                self._conversations.popitem(last=False)
+                metrics.inc("chat.evicted_ttl")
+
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                conversation = Conversation(conversation_id)
+                self._conversations[conversation_id] = conversation
+                while len(self._conversations) > self.max_conversations:
+                    self._conversations.popitem(last=False)
+                    metrics.inc("chat.evicted_lru")
+            else:
+                self._conversations.move_to_end(conversation_id)
+            conversation.last_used = now
+            return conversation
+
+    def _record(self, conversation: Conversation, message: str, reply: str) -> None:
+        """Dopisuje turę; przekroczenie budżetu zleca streszczanie w tle (odpowiedź już wysłana)."""
+        conversation.turns.append(("user", message))
+        conversation.turns.append(("model", reply))
+        if conversation.tokens > self.token_budget and not conversation.compacting:
+            conversation.compacting = True
+            self._compactor.submit(self._compact, conversation)
+
+    def _split_point(self, conversation: Conversation) -> int:
+        """Liczba najstarszych tur do streszczenia - reszta mieści się w compact_ratio budżetu."""
+        target = int(self.token_budget * self.compact_ratio)
+        kept_tokens = 0
+        split = len(conversation.turns)
+        while split > 0:
+            tokens = estimate_tokens(conversation.turns[split - 1][1])
+            if kept_tokens + tokens > target:
+                break
+            kept_tokens += tokens
+            split -= 1
+        return split
+
+    def _compact(self, conversation: Conversation) -> None:
+        """
+        Streszcza najstarsze tury do pola summary. Zapytanie do AI idzie bez
+        blokady rozmowy; tury dopisane w międzyczasie zostają nienaruszone.
+        """
+        try:
+            with conversation.lock:
+                split = self._split_point(conversation)
+                old_turns = conversation.turns[:split]
+                previous_summary = conversation.summary
+            if not old_turns:
+                return
+            transcript = "\n".join(f"{'Użytkownik' if role == 'user' else 'Asystent'}: {text}" for role, text in old_turns)
+            # Streszczenie też liczy się do budżetu - najwyżej połowa tego, co zostaje po ostatnich turach
+            max_words = max(50, int(self.token_budget * (1 - self.compact_ratio) / 2))
+            prompt = f"""
+            Streść zwięźle poniższą rozmowę, zachowując fakty, decyzje i ustalenia potrzebne do jej kontynuacji.
+            Streszczenie nie może przekraczać {max_words} słów.
+            Dotychczasowe streszczenie: {previous_summary or "(brak)"}
+            Rozmowa:
+            {transcript}
+            """
+            summary = previous_summary
+            try:
+                summary = self.gemini.message(prompt, route="chat.compaction").strip()
+                metrics.inc("chat.compactions")
+            except Exception as e:
+                # Bez streszczenia po prostu odrzucamy najstarsze tury
+                print(f"Error compacting chat history: {e}")
+                metrics.inc("chat.compaction_errors")
+            with conversation.lock:
+                conversation.summary = summary
+                del conversation.turns[:split]
+        finally:
+            conversation.compacting = False
+
+
+def create_chat_manager(gemini: Optional[GeminiChat] = None) -> ChatSessionManager:
+    return ChatSessionManager(
+        gemini or GeminiChat(),
+        token_budget=int(os.getenv("CHAT_TOKEN_BUDGET", "3000")),
+        max_conversations=int(os.getenv("CHAT_MAX_CONVERSATIONS", "1000")),
+        ttl=float(os.getenv("CHAT_TTL_S", "1800")),
+    )
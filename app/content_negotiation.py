@@ -0,0 +1,99 @@
+import contextvars
+from typing import Any, Callable, Coroutine
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import msgpack
+except ImportError:  # MessagePack jest opcjonalny - bez niego zostaje JSON
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+_wants_msgpack: contextvars.ContextVar[bool] = contextvars.ContextVar("wants_msgpack", default=False)
+
+
+def _media_type(header_value: str) -> str:
+    return header_value.split(";", 1)[0].strip().lower()
+
+
+def is_msgpack(content_type: str) -> bool:
+    return _media_type(content_type) in MSGPACK_MEDIA_TYPES
+
+
+def accepts_msgpack(accept: str) -> bool:
+    return any(_media_type(part) in MSGPACK_MEDIA_TYPES for part in accept.split(","))
+
+
+def packb(content: Any) -> bytes:
+    return msgpack.packb(content, use_bin_type=True)
+
+
+def unpackb(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+class MsgPackRequest(Request):
+    """Request z treścią MessagePack - FastAPI dostaje ją przez json(), więc walidacja jest ta sama."""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = unpackb(await self.body())
+        return self._json
+
+
+class NegotiatedResponse(JSONResponse):
+    """Odpowiedź w MessagePack, gdy klient o to poprosił (Accept), w przeciwnym razie JSON."""
+
+    def __init__(self, content: Any, *args, **kwargs):
+        if _wants_msgpack.get():
+            self.media_type = MSGPACK_MEDIA_TYPE
+        super().__init__(content, *args, **kwargs)
+        if msgpack is not None:
+            # Treść zależy od Accept - cache i proxy nie mogą mieszać wariantów
+            self.headers.add_vary_header("Accept")
+
+    def render(self, content: Any) -> bytes:
+        if _wants_msgpack.get():
+            return packb(content)
+        return super().render(content)
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Trasa obsługująca MessagePack na wejściu (Content-Type) i wyjściu (Accept).
+    JSON pozostaje domyślnym formatem.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_route_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "")
+            # Bez biblioteki msgpack odpowiadamy po prostu JSON-em
+            wants_msgpack = msgpack is not None and accepts_msgpack(request.headers.get("accept", ""))
+            if is_msgpack(content_type) and msgpack is None:
+                raise HTTPException(
+                    status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                    detail="MessagePack support is not installed"
+                )
+
+            if is_msgpack(content_type):
+                # FastAPI czyta treść jako JSON tylko dla application/json
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (key, b"application/json" if key == b"content-type" else value)
+                    for key, value in request.scope["headers"]
+                ]
+                request = MsgPackRequest(scope, request.receive)
+
+            token = _wants_msgpack.set(wants_msgpack)
+            try:
+                return await original_route_handler(request)
+            finally:
+                _wants_msgpack.reset(token)
+
+        return route_handler
@@ -0,0 +1,123 @@
+import bisect
+import math
+import random
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Tryby losowania wydarzeń
+INDEPENDENT = "independent"  # każde wydarzenie zachodzi niezależnie z prawdopodobieństwem chance
+WEIGHTED = "weighted"        # jedno losowanie O(1) z tablicy aliasów ważonej chance
+SAMPLING_MODES = (INDEPENDENT, WEIGHTED)
+
+# Ile razy losujemy ponownie trafiając w niedostępne wydarzenie,
+# zanim zbudujemy tablicę skumulowaną tylko z dostępnych
+MAX_REJECTIONS = 8
+
+
+class AliasTable:
+    """Tablica aliasów (metoda Vose'a) - losowanie indeksu z rozkładu ważonego w O(1)."""
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def draw(self, rng: random.Random) -> int:
+        """Jedno wywołanie RNG: część całkowita wybiera kolumnę, ułamkowa - alias."""
+        u = rng.random() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+
+class EventSampler:
+    """
+    Silnik losowania wydarzeń z katalogu z izolowanymi, seedowalnymi
+    strumieniami RNG dla każdej sesji gry.
+    """
+
+    def __init__(self, chances: Sequence[float], mode: str = INDEPENDENT, seed: Optional[str] = None):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        self.mode = mode
+        self.chances = list(chances)
+        self.seed = seed
+
+        # Dodatkowa pozycja "brak wydarzenia" dobrana tak, żeby dla pełnego
+        # katalogu P(brak) było takie jak przy niezależnych losowaniach
+        total = sum(self.chances)
+        p_none = math.prod(1.0 - min(c, 1.0) for c in self.chances)
+        if p_none >= 1.0 or total == 0:
+            none_weight = 1.0
+        else:
+            none_weight = total * p_none / (1.0 - p_none) if p_none > 0 else 0.0
+        self.weights = self.chances + [none_weight]
+        self.none_index = len(self.chances)
+        self.table = AliasTable(self.weights) if sum(self.weights) > 0 else None
+
+        self._default_rng = random.Random(seed)
+        self._streams: Dict[str, random.Random] = {}
+        self._lock = threading.Lock()
+
+    def rng(self, game_id: Optional[str] = None) -> random.Random:
+        """Zwraca strumień RNG sesji (deterministyczny dla danego seeda i game_id)."""
+        if game_id is None:
+            return self._default_rng
+        with self._lock:
+            stream = self._streams.get(game_id)
+            if stream is None:
+                stream = random.Random(f"{self.seed}:{game_id}" if self.seed is not None else None)
+                self._streams[game_id] = stream
+            return stream
+
+    def reseed(self, seed: str, game_id: Optional[str] = None) -> None:
+        """Ustawia seed strumienia sesji - pozwala odtworzyć rozgrywkę."""
+        with self._lock:
+            if game_id is None:
+                self._default_rng = random.Random(seed)
+            else:
+                self._streams[game_id] = random.Random(seed)
+
+    def forget(self, game_id: str) -> None:
+        with self._lock:
+            self._streams.pop(game_id, None)
+
+    def sample(self, is_eligible: Callable[[int], bool], rng: random.Random) -> Optional[int]:
+        """Zwraca indeks wylosowanego wydarzenia albo None, jeśli nic nie zaszło."""
+        if self.mode == INDEPENDENT:
+            fired = [i for i, chance in enumerate(self.chances) if is_eligible(i) and rng.random() < chance]
+            return rng.choice(fired) if fired else None
+
+        if self.table is None:
+            return None
+        for _ in range(MAX_REJECTIONS):
+            i = self.table.draw(rng)
+            if i == self.none_index:
+                return None
+            if is_eligible(i):
+                return i
+        return self._sample_eligible(is_eligible, rng)
+
+    def _sample_eligible(self, is_eligible: Callable[[int], bool], rng: random.Random) -> Optional[int]:
+        """Losowanie z tablicy skumulowanej ograniczonej do dostępnych wydarzeń."""
+        candidates: List[int] = [i for i in range(len(self.chances)) if is_eligible(i)]
+        candidates.append(self.none_index)
+        cumulative = []
+        total = 0.0
+        for i in candidates:
+            total += self.weights[i]
+            cumulative.append(total)
+        if total <= 0:
+            return None
+        i = candidates[bisect.bisect_right(cumulative, rng.random() * total)]
+        return None if i == self.none_index else i
@@ -1,16 +1,78 @@
-import json
-import random
+import os
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Set
 from app.schemas import GameInterface, EventResponse, GameEvent, EventType
+from app.event_sampler import EventSampler
+from app.catalog import CompiledCatalog, load_events
+from app.metrics import metrics
+from app.tracing import tracer
 
 class EventService:
 
-    def __init__(self):
+    def __init__(self, mode: Optional[str] = None, seed: Optional[str] = None,
+                 max_sessions: Optional[int] = None, session_ttl: Optional[float] = None):
         self.EVENTS_FILE = Path(__file__).parent / "events/event.json"
-        with open(self.EVENTS_FILE, "r") as f:
-            self.EVENTS = json.load(f)
+        # Skompilowany katalog (mmap, współdzielony przez workery) albo event.json
+        self.EVENTS = load_events(self.EVENTS_FILE)
         self.triggered_events = set()
+        # Wyzwolone wydarzenia per sesja gry (game_id); nieużywane sesje są usuwane (LRU + TTL)
+        self.session_triggered_events: "OrderedDict[str, Set[str]]" = OrderedDict()
+        self._session_last_used: Dict[str, float] = {}
+        self.max_sessions = max_sessions or int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+        self.session_ttl = session_ttl or float(os.getenv("SESSION_TTL_S", "86400"))
+        self._lock = threading.Lock()
+        if isinstance(self.EVENTS, CompiledCatalog):
+            # Warunki i szanse z indeksu katalogu - rekordy dekodowane tylko dla wyniku
+            self._is_eligible = self.EVENTS.is_eligible
+            chances = self.EVENTS.chances()
+        else:
+            self._is_eligible = self._is_eligible_json
+            chances = [event.get("chance", 0) for event in self.EVENTS]
+        self.sampler = EventSampler(
+            chances,
+            mode=mode or os.getenv("EVENT_SAMPLING_MODE", "independent"),
+            seed=seed if seed is not None else os.getenv("EVENT_RNG_SEED"),
+        )
+
+    def _triggered_for(self, game_id: Optional[str]) -> Set[str]:
+        """Zwraca zbiór wyzwolonych wydarzeń dla sesji (lub globalny)."""
+        if game_id is None:
+            return self.triggered_events
+        now = time.monotonic()
+        with self._lock:
+            evicted = self._evict_expired(now)
+            triggered = self.session_triggered_events.get(game_id)
+            if triggered is None:
+                triggered = self.session_triggered_events[game_id] = set()
+                while len(self.session_triggered_events) > self.max_sessions:
+                    evicted_id, _ = self.session_triggered_events.popitem(last=False)
+                    self._session_last_used.pop(evicted_id, None)
+                    evicted.append(evicted_id)
+                    metrics.inc("event_sessions.evicted_lru")
+            else:
+                self.session_triggered_events.move_to_end(game_id)
+            self._session_last_used[game_id] = now
+        # Razem z wyzwolonymi wydarzeniami znika strumień RNG sesji
+        for evicted_id in evicted:
+            self.sampler.forget(evicted_id)
+        return triggered
+
+    def _evict_expired(self, now: float) -> List[str]:
+        """Usuwa sesje nieużywane dłużej niż TTL (wywoływać pod blokadą)."""
+        evicted = []
+        # Wygasłe sesje są na początku kolejki LRU
+        for game_id in self.session_triggered_events:
+            if now - self._session_last_used.get(game_id, now) <= self.session_ttl:
+                break
+            evicted.append(game_id)
+        for game_id in evicted:
+            del self.session_triggered_events[game_id]
+            del self._session_last_used[game_id]
+            metrics.inc("event_sessions.evicted_ttl")
+        return evicted
 
     def _check_conditions(self, event: Dict[str, Any], game_state: GameInterface) -> bool:
         """
@@ -39,6 +101,10 @@ class EventService:
 
         return True
 
+    def _is_eligible_json(self, index: int, game_state: GameInterface, excluded: Set[str]) -> bool:
+        event = self.EVENTS[index]
+        return event["name"] not in excluded and self._check_conditions(event, game_state)
+
 
     def _apply_effects(self, game_state: GameInterface, effects: Dict[str, int]) -> GameInterface:
         """Aplikuje efekty wydarzenia do stanu gry"""
@@ -52,29 +118,29 @@ class EventService:
                 
         return updated_state
 
-    def choose_event(self, game_state: GameInterface) -> EventResponse:
+    def choose_event(self, game_state: GameInterface, game_id: Optional[str] = None) -> EventResponse:
         """Główna metoda wybierająca i sprawdzająca wydarzenie"""
-        possible_events = []
-        
-        for event in self.EVENTS:
-            if event["name"] in self.triggered_events:
-                continue  # Skip already triggered events
+        triggered_events = self._triggered_for(game_id)
 
-            # Check conditions
-            if self._check_conditions(event, game_state):
-                # Check probability
-                if random.random() < event.get("chance", 0):
-                    possible_events.append(event)
+        def is_eligible(index: int) -> bool:
+            # Skip already triggered events, then check conditions
+            return self._is_eligible(index, game_state, triggered_events)
 
-        if not possible_events:
+        with tracer.span("event_service.choose_event", mode=self.sampler.mode, catalog_size=len(self.EVENTS)) as span:
+            selected_index = self.sampler.sample(is_eligible, self.sampler.rng(game_id))
+            if span.recording:
+                # Losowanie ważone sprawdza tylko wylosowane wydarzenia - liczymy dostępne osobno
+                span.set_attribute("candidate_count", sum(1 for i in range(len(self.EVENTS)) if is_eligible(i)))
+            span.set_attribute("event_occurred", selected_index is not None)
+
+        if selected_index is None:
             return EventResponse(
                 event_occurred=False,
                 message="Brak dostępnych wydarzeń lub żadne nie wystąpiło"
             )
 
-        # Wybierz losowe wydarzenie
-        selected_event = random.choice(possible_events)
-        self.triggered_events.add(selected_event["name"])  # Mark as triggered
+        selected_event = self.EVENTS[selected_index]
+        triggered_events.add(selected_event["name"])  # Mark as triggered
         
         # Aplikuj efekty
         updated_game_state = self._apply_effects(game_state, selected_event["effects"])
@@ -93,12 +159,14 @@ class EventService:
             message=f"Wydarzenie: {selected_event['name']} - {selected_event['description']}"
         )
 
-    def get_available_events(self, game_state: GameInterface) -> List[Dict[str, Any]]:
+    def get_available_events(self, game_state: GameInterface, game_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Zwraca listę dostępnych wydarzeń dla aktualnego stanu gry"""
         available_events = []
+        triggered_events = self._triggered_for(game_id)
         
-        for event in self.EVENTS:
-            if event["name"] not in self.triggered_events and self._check_conditions(event, game_state):
+        for index in range(len(self.EVENTS)):
+            if self._is_eligible(index, game_state, triggered_events):
+                event = self.EVENTS[index]
                 available_events.append({
                     "name": event["name"],
                     "type": event["type"],
@@ -109,17 +177,29 @@ class EventService:
         
         return available_events
 
-    def reset_triggered_events(self):
+    def reset_triggered_events(self, game_id: Optional[str] = None):
         """Resetuje listę wyzwolonych wydarzeń"""
-        self.triggered_events.clear()
+        self._triggered_for(game_id).clear()
+
+    def forget_session(self, game_id: str):
+        """Usuwa stan losowania i wyzwolone wydarzenia sesji"""
+        with self._lock:
+            self.session_triggered_events.pop(game_id, None)
+            self._session_last_used.pop(game_id, None)
+        self.sampler.forget(game_id)
+
+    def seed_session(self, seed: str, game_id: Optional[str] = None):
+        """Ustawia seed RNG sesji i czyści jej wyzwolone wydarzenia (odtworzenie gry)"""
+        self.sampler.reseed(seed, game_id)
+        self.reset_triggered_events(game_id)
 
-    def simulate_multiple_events(self, game_state: GameInterface, num_events: int = 5) -> List[EventResponse]:
+    def simulate_multiple_events(self, game_state: GameInterface, num_events: int = 5, game_id: Optional[str] = None) -> List[EventResponse]:
         """Symuluje wiele wydarzeń dla testowania"""
         results = []
         current_state = game_state
         
         for _ in range(num_events):
-            result = self.choose_event(current_state)
+            result = self.choose_event(current_state, game_id)
             results.append(result)
             
             if result.event_occurred and result.updated_game_state:
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.metrics import metrics
+
+
+class ReplayMiss(LookupError):
+    """Brak nagrania dla danego promptu w trybie odtwarzania."""
+
+
+def prompt_hash(contents: Any, system_prompt: Optional[str] = None, response_schema=None) -> str:
+    """
+    Klucz nagrania: hash treści, promptu systemowego i schematu odpowiedzi.
+    Model celowo nie wchodzi do klucza - routing może wybrać inny przy odtwarzaniu.
+    """
+    payload = json.dumps(
+        [contents, system_prompt, getattr(response_schema, "__name__", None)],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Recorder:
+    """Dopisuje każde wywołanie Gemini (prompt, odpowiedź, latencja) do pliku JSONL."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def record(self, key: str, model: str, route: Optional[str], contents: Any, system_prompt: Optional[str],
+               response: str, latency_s: float, chunks: Optional[List[str]] = None) -> None:
+        entry = {
+            "hash": key,
+            "model": model,
+            "route": route,
+            "system_prompt": system_prompt,
+            "prompt": contents,
+            "response": response,
+            "latency_s": round(latency_s, 4),
+            "recorded_at": time.time(),
+        }
+        if chunks is not None:
+            entry["chunks"] = chunks
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+        metrics.inc("replay.recorded")
+
+
+class ReplayBackend:
+    """
+    Odtwarza nagrane odpowiedzi po hashu promptu, z oryginalnym czasem
+    odpowiedzi podzielonym przez `speed` (0 = bez opóźnień). Powtórzenia
+    tego samego promptu dostają kolejne nagrania w kolejności zapisu; gdy
+    nagrania się wyczerpią, kolejne wywołanie kończy się ReplayMiss - ruch
+    odtwarzany różni się wtedy od nagranego.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.path = path
+        self.speed = speed
+        self._records: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._next: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._records[entry["hash"]].append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(records) for records in self._records.values())
+
+    def _take(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            records = self._records.get(key)
+            if not records:
+                metrics.inc("replay.misses")
+                raise ReplayMiss(f"No recording for prompt {key[:12]}")
+            index = self._next[key]
+            if index >= len(records):
+                metrics.inc("replay.exhausted")
+                raise ReplayMiss(f"All {len(records)} recordings for prompt {key[:12]} already replayed")
+            self._next[key] = index + 1
+        metrics.inc("replay.hits")
+        return records[index]
+
+    def _delay(self, entry: Dict[str, Any]) -> float:
+        return entry["latency_s"] / self.speed if self.speed > 0 else 0.0
+
+    def respond(self, key: str) -> str:
+        entry = self._take(key)
+        time.sleep(self._delay(entry))
+        return entry["response"]
+
+    async def arespond(self, key: str) -> str:
+        entry = self._take(key)
+        await asyncio.sleep(self._delay(entry))
+        return entry["response"]
+
+    def stream(self, key: str) -> Iterator[str]:
+        entry = self._take(key)
+        chunks = entry.get("chunks") or [entry["response"]]
+        # Czas całej odpowiedzi rozkładamy równo na kawałki
+        step = self._delay(entry) / len(chunks)
+        for chunk in chunks:
+            time.sleep(step)
+            yield chunk
+
+
+_shared: Dict[tuple, Any] = {}
+_shared_lock = threading.Lock()
+
+
+def get_recorder(path: str) -> Recorder:
+    """Jeden rejestrator na plik - współdzielony przez wszystkie instancje GeminiChat."""
+    with _shared_lock:
+        if ("record", path) not in _shared:
+            _shared[("record", path)] = Recorder(path)
+        return _shared[("record", path)]
+
+
+def get_replay_backend(path: str) -> ReplayBackend:
+    """Jeden backend odtwarzania na plik (nagrania ładowane raz)."""
+    with _shared_lock:
+        if ("replay", path) not in _shared:
+            _shared[("replay", path)] = ReplayBackend(path, speed=float(os.getenv("GEMINI_REPLAY_SPEED", "1.0")))
+        return _shared[("replay", path)]
@@ -1,51 +1,80 @@
 from __future__ import annotations
 
 from enum import Enum
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, status, Depends
 from pydantic import BaseModel, Field
 from typing import Optional, Any, Dict
+import hmac
 import json
 import os
+import uuid
+from contextlib import contextmanager
+from functools import partial
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from app.summary_service import SummaryService
-from app.schemas import GameSummaryRequest, GameSummaryResponse, GenerateYearResponse, GameInterface, GenerateYearRequest
+from app.session_store import SessionConflict, SessionNotFound, check_turn, create_session_store
+from app.speculation import create_speculative_cache
+from app.metrics import metrics
+from app.model_router import model_router
+from app.cancellation import run_cancellable
+from app.content_negotiation import NegotiatedResponse, NegotiatedRoute
+from fastapi.concurrency import run_in_threadpool
+from app.schemas import GameSummaryRequest, GameSummaryResponse, GenerateYearResponse, GameInterface, GenerateYearRequest, GameHistory
 
 # Załaduj zmienne środowiskowe
 load_dotenv()
 from .chat_gemini import GeminiChat
+from app.chat_sessions import ChatSessionManager, create_chat_manager
 
-# Globalna instancja chatu (dla pojedynczego użytkownika)
-chat_instance: Optional[GeminiChat] = None
+# Globalny menedżer rozmów (osobna historia dla każdej rozmowy)
+chat_manager: Optional[ChatSessionManager] = None
+
+# Magazyn sesji gry (historia wyborów po stronie serwera)
+session_store = create_session_store()
+
+# Spekulatywne generowanie następnej tury (opt-in: SPECULATIVE_GENERATION=1)
+speculative_cache = create_speculative_cache()
 
 # Modele Pydantic dla request/response
 class ChatRequest(BaseModel):
     message: str
+    conversation_id: Optional[str] = None
+    stream: bool = False
 
 class ChatResponse(BaseModel):
     response: str
     status: str
     model: str
+    conversation_id: str
     error: Optional[str] = None
 
 app = FastAPI(
     title="Chat with Gemini API",
     description="API do czatu z Google Gemini",
-    version="1.1.0"
+    version="1.1.0",
+    default_response_class=NegotiatedResponse
 )
+# MessagePack (Content-Type/Accept: application/msgpack) obok domyślnego JSON
+app.router.route_class = NegotiatedRoute
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # zezwól na wszystkie domeny
     allow_credentials=True,
     allow_methods=["POST", "GET", "OPTIONS"],
-    allow_headers=["Content-Type", "Accept"],
+    allow_headers=["Content-Type", "Accept", "X-Profile", "X-Admin-Token", "traceparent"],
+    expose_headers=["traceparent", "X-Profile-Id", "X-Conversation-Id"],
 )
 
 # Import additional modules for IP logging
-from fastapi import Request
+from fastapi import Request, Header, WebSocket
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import logging
 import datetime
+import time
+from app.profiler import profiler, profiled
+from app.tracing import tracer
 
 # Configure logging for IP tracking
 logging.basicConfig(level=logging.INFO)
@@ -68,13 +97,46 @@ async def log_ip_middleware(request: Request, call_next):
     # Log the request
     logger.info(f"[{timestamp}] IP: {client_ip} - Method: {method} - Path: {url_path}")
 
-    # Continue processing the request
-    response = await call_next(request)
+    # Continue processing the request (root span of the trace)
+    with tracer.span(
+        "http.request",
+        traceparent=request.headers.get("traceparent"),
+        method=method,
+        path=url_path,
+        client_ip=client_ip,
+    ) as span:
+        response = await call_next(request)
+        span.set_attribute("status_code", response.status_code)
+    if span.recording:
+        response.headers["traceparent"] = span.traceparent()
+    return response
+
+# Profiling Middleware
+@app.middleware("http")
+async def profile_middleware(request: Request, call_next):
+    """
+    Middleware próbkujący stos requestu (PROFILE_SAMPLE_RATE albo nagłówek
+    X-Profile: 1 razem z poprawnym X-Admin-Token). Profile wolnych requestów
+    trafiają do bufora dostępnego pod /admin/profiles.
+    """
+    forced = request.headers.get("X-Profile") == "1" and _is_admin_token(request.headers.get("X-Admin-Token"))
+    if not profiler.should_profile(forced):
+        return await call_next(request)
+
+    profile = profiler.start(request.method, request.url.path)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        kept = profiler.stop(profile, (time.perf_counter() - started) * 1000, forced)
+    if kept:
+        response.headers["X-Profile-Id"] = str(profile.id)
     return response
 
 @app.on_event("startup")
 def startup_event():
     print(os.getenv("GEMINI_API_KEY"))
+    initialize_chat()
 
 @app.get("/")
 def read_root():
@@ -82,6 +144,7 @@ def read_root():
         "message": "Witaj wariacik! API działa jak należy 🚀",
         "docs": "/docs",
         "redoc": "/redoc",
+        "websocket": "/ws",
         "chat_endpoints": {
             "chat": "/chat - wysyłanie wiadomości",
             "clear": "/clear - czyszczenie historii rozmowy",
@@ -89,14 +152,7 @@ def read_root():
     }
 
 
-@app.post("/generate_year", response_model=GenerateYearResponse)
-def generate_year(request: GenerateYearRequest) -> GenerateYearResponse:
-    """
-    Generates a new year in the game based on the current game state.
-    """
-
-    
-    system_prompt = """
+GENERATE_YEAR_SYSTEM_PROMPT = """
 # System Prompt: Mistrz Gry - "Architekt Przyszłości"
 
 ## OPTYMALIZACJA WYDAJNOŚCI
@@ -395,61 +451,218 @@ Sytuacja: Wiek 28, money=45000, Mid Developer, education="Inżynier IT", married
 OSTATNIE PRZYPOMNIENIE: Nie generuj tego samego contentu 2 razy z rzędu. Każde wywołanie = świeże, kontekstowe, zróżnicowane opcje. SZYBKO I NA TEMAT.
 """
 
-    user_prompt = f"""
+
+def _generate_year_prompt(game_interface: GameInterface, history: list[str], options_amount: int) -> str:
+    """Historia to lista wpisów GameHistory w JSON (tak jak w magazynie sesji)."""
+    return f"""
     To moj stan gry:
-    {request.game_interface.model_dump_json()}
+    {game_interface.model_dump_json()}
     To moja historia: 
-    {request.history}
-    Wygeneruj taka ilosc opcji: {request.options_amount}
+    [{", ".join(history)}]
+    Wygeneruj taka ilosc opcji: {options_amount}
     """
 
+
+async def _generate_options_async(game_interface: GameInterface, history: list[str], options_amount: int,
+                                  route: str = "generate_year") -> dict:
+    """
+    Wywołuje model i zwraca sparsowane opcje na kolejny okres.
+    Zadanie można anulować w trakcie - przerywa to też zapytanie do modelu.
+    """
     chat = GeminiChat()
 
-    response_text = chat.message(user_prompt, system_prompt)
+    response_text = await chat.amessage(
+        _generate_year_prompt(game_interface, history, options_amount),
+        GENERATE_YEAR_SYSTEM_PROMPT,
+        route=route,
+    )
 
     a=json.loads(response_text[7:-3])
     return a
 
 
+@contextmanager
+def _session_errors(game_id: str):
+    """Zamienia błędy magazynu sesji na odpowiedzi HTTP: 404 (nieznana sesja) i 409 (niezgodna tura)."""
+    try:
+        yield
+    except SessionNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Session {game_id} not found"
+        )
+    except SessionConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+def _session_history(game_id: str, choice: Optional[GameHistory], turn: Optional[int]) -> list[str]:
+    """
+    Zwraca historię sesji (wpisy w JSON, bez walidacji) razem z bieżącym wyborem,
+    jeszcze go nie zapisując - wybór trafia do sesji dopiero po udanym
+    wygenerowaniu odpowiedzi (_record_choice).
+    """
+    with _session_errors(game_id):
+        history = session_store.history_json(game_id)
+        if choice:
+            choice_json = choice.model_dump_json()
+            # Ponowienie już zapisanej tury: historia do tej tury włącznie
+            history = history + [choice_json] if check_turn(history, choice_json, turn) else history[:turn + 1]
+    return history
+
+
+def _record_choice(game_id: str, choice: GameHistory, turn: Optional[int]) -> None:
+    """Zapisuje wybór w sesji (idempotentnie, gdy podano numer tury)."""
+    with _session_errors(game_id):
+        session_store.append(game_id, choice, turn)
+
+
+async def _next_options(request: GenerateYearRequest, history: list[str]) -> dict:
+    """Opcje na kolejny okres: wynik spekulacji, jeśli pasuje, w przeciwnym razie nowe wywołanie modelu."""
+    if speculative_cache and request.game_id and request.choice:
+        result = await speculative_cache.take(
+            request.game_id, request.choice, request.options_amount, request.game_interface
+        )
+        if result is not None:
+            return result
+    return await _generate_options_async(request.game_interface, history, request.options_amount)
+
+
+@app.post("/generate_year", response_model=GenerateYearResponse)
+@profiled
+async def generate_year(request: GenerateYearRequest, http_request: Request) -> GenerateYearResponse:
+    """
+    Generates a new year in the game based on the current game state.
+    Generation is aborted when the client disconnects or REQUEST_TIMEOUT_S passes.
+    """
+    history = [entry.model_dump_json() for entry in request.history]
+    if request.game_id:
+        # Magazyn sesji blokuje - poza pętlą zdarzeń
+        history = await run_in_threadpool(_session_history, request.game_id, request.choice, request.turn)
+
+    # Czekanie na spekulację też podlega limitowi czasu i rozłączeniu klienta
+    result = await run_cancellable(http_request, _next_options(request, history))
+
+    if request.game_id and request.choice:
+        # Przerwany request nie zapisuje wyboru - ponowienie go nie zduplikuje
+        await run_in_threadpool(_record_choice, request.game_id, request.choice, request.turn)
+
+    if speculative_cache and request.game_id:
+        # Opcje następnej tury liczone w tle dla najbardziej prawdopodobnych wyborów
+        speculative_cache.speculate(
+            request.game_id,
+            request.game_interface,
+            history,
+            GenerateYearResponse.model_validate(result),
+            request.options_amount,
+            partial(_generate_options_async, route="generate_year.speculative"),
+        )
+    return result
+
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+def get_metrics():
+    """
+    Zwraca liczniki procesu (spekulacje, anulowania itp.).
+    """
+    return metrics.snapshot()
+
+@app.get("/metrics/models")
+def get_model_metrics():
+    """
+    Zwraca stan routingu modeli: polityki endpointów i obserwowane latencje/błędy modeli.
+    """
+    return model_router.snapshot()
+
+# Admin Endpoints
+def _is_admin_token(token: Optional[str]) -> bool:
+    """Bez ustawionego ADMIN_TOKEN żaden token nie jest poprawny."""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    return bool(admin_token) and token is not None and hmac.compare_digest(token, admin_token)
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Sprawdza token administratora; bez ustawionego ADMIN_TOKEN endpointy admina są wyłączone."""
+    if not _is_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin token"
+        )
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    """
+    Zwraca listę zachowanych profili requestów.
+    """
+    return {
+        "profiles": profiler.list(),
+        "slow_threshold_ms": profiler.slow_ms,
+        "sample_rate": profiler.sample_rate
+    }
+
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+def download_profile(profile_id: int):
+    """
+    Zwraca profil w formacie folded stacks (flamegraph.pl, speedscope).
+    """
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return PlainTextResponse(
+        profile.folded(),
+        headers={"Content-Disposition": f"attachment; filename=profile-{profile_id}.folded"}
+    )
+
 # Funkcja pomocnicza do inicjalizacji chatu
 def initialize_chat():
-    """Inicjalizuje instancję chatu jeśli jeszcze nie istnieje."""
-    global chat_instance
-    if chat_instance is None:
+    """Inicjalizuje menedżer rozmów jeśli jeszcze nie istnieje."""
+    global chat_manager
+    if chat_manager is None:
         try:
-            chat_instance = GeminiChat()
-            chat_instance.start_chat()
+            chat_manager = create_chat_manager()
         except ValueError as e:
             # Jeśli klucz API nie jest dostępny, aplikacja nie będzie mogła w pełni działać
             # Logujemy błąd, ale nie przerywamy startu serwera
             print(f"Błąd inicjalizacji chatu: {str(e)}")
 
-# Funkcja pomocnicza do pobrania instancji chatu
-def get_chat_instance() -> GeminiChat:
-    """Pobiera instancję chatu, zgłaszając błąd jeśli nie jest dostępna."""
-    if chat_instance is None:
+# Funkcja pomocnicza do pobrania menedżera rozmów
+def get_chat_manager() -> ChatSessionManager:
+    """Pobiera menedżer rozmów, zgłaszając błąd jeśli nie jest dostępny."""
+    if chat_manager is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Chat service is not available. Check API key."
         )
-    return chat_instance
+    return chat_manager
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(message: ChatRequest) -> ChatResponse:
+def chat(message: ChatRequest):
     """
     Endpoint do wysyłania wiadomości do modelu Gemini.
+    Bez conversation_id zaczyna nową rozmowę; stream=true zwraca odpowiedź kawałkami.
     """
-    chat = get_chat_instance()
+    manager = get_chat_manager()
+    conversation_id = message.conversation_id or uuid.uuid4().hex
+
+    if message.stream:
+        return StreamingResponse(
+            manager.stream(conversation_id, message.message),
+            media_type="text/plain; charset=utf-8",
+            headers={"X-Conversation-Id": conversation_id}
+        )
+
     try:
-        response_text = chat.message(message.message)
+        response_text = manager.send(conversation_id, message.message)
         return ChatResponse(
             response=response_text,
             status="success",
-            model=chat.model.model_name
+            model=manager.model_name,
+            conversation_id=conversation_id
         )
     except Exception as e:
         raise HTTPException(
@@ -458,52 +671,53 @@ def chat(message: ChatRequest) -> ChatResponse:
         )
 
 @app.delete("/clear")
-def clear_history():
+def clear_history(conversation_id: str):
     """
     Endpoint do czyszczenia historii rozmowy.
     """
-    chat = get_chat_instance()
-    chat.clear_chat()
-    # Po wyczyszczeniu, musimy ponownie zainicjować sesję czatu
-    chat.start_chat()
+    get_chat_manager().clear(conversation_id)
 
     return {
         "message": "Historia rozmowy została wyczyszczona",
-        "status": "success"
+        "status": "success",
+        "conversation_id": conversation_id
     }
 
 
 # Event System Endpoints
 from app.event_service import EventService
-from app.schemas import GameInterface, EventResponse, GameEvent
+from app.catalog import CompiledCatalog
+from app.schemas import GameInterface, EventResponse, GameEvent, EventDescribeBatchRequest
 
 # Global event service instance
 event_service = EventService()
 
 @app.post("/events/trigger", response_model=EventResponse)
-def trigger_event(game_state: GameInterface):
+@profiled
+def trigger_event(game_state: GameInterface, game_id: Optional[str] = None):
     """
     Wyzwala losowe wydarzenie na podstawie aktualnego stanu gry.
     """
-    return event_service.choose_event(game_state)
+    return event_service.choose_event(game_state, game_id)
 
 @app.post("/events/available")
-def get_available_events(game_state: GameInterface):
+def get_available_events(game_state: GameInterface, game_id: Optional[str] = None):
     """
     Zwraca listę dostępnych wydarzeń dla aktualnego stanu gry.
     """
-    available_events = event_service.get_available_events(game_state)
+    available_events = event_service.get_available_events(game_state, game_id)
     return {
         "available_events": available_events,
         "count": len(available_events)
     }
 
 @app.post("/events/simulate")
-def simulate_events(game_state: GameInterface, num_events: int = 5):
+@profiled
+def simulate_events(game_state: GameInterface, num_events: int = 5, game_id: Optional[str] = None):
     """
     Symuluje wiele wydarzeń dla testowania.
     """
-    results = event_service.simulate_multiple_events(game_state, num_events)
+    results = event_service.simulate_multiple_events(game_state, num_events, game_id)
     return {
         "simulation_results": results,
         "total_events": len(results),
@@ -511,13 +725,21 @@ def simulate_events(game_state: GameInterface, num_events: int = 5):
     }
 
 @app.post("/events/reset")
-def reset_events():
+def reset_events(game_id: Optional[str] = None):
     """
     Resetuje listę wyzwolonych wydarzeń.
     """
-    event_service.reset_triggered_events()
+    event_service.reset_triggered_events(game_id)
     return {"message": "Lista wyzwolonych wydarzeń została zresetowana"}
 
+@app.post("/events/seed")
+def seed_events(seed: str, game_id: Optional[str] = None):
+    """
+    Ustawia seed losowania wydarzeń dla sesji - pozwala dokładnie odtworzyć rozgrywkę.
+    """
+    event_service.seed_session(seed, game_id)
+    return {"message": "Ustawiono seed losowania", "seed": seed, "game_id": game_id}
+
 @app.get("/events/info")
 def get_events_info():
     """
@@ -526,15 +748,20 @@ def get_events_info():
     return {
         "total_events": len(event_service.EVENTS),
         "triggered_events": list(event_service.triggered_events),
-        "available_events_file": str(event_service.EVENTS_FILE)
+        "sampling_mode": event_service.sampler.mode,
+        "available_events_file": str(event_service.EVENTS_FILE),
+        "compiled_catalog": str(event_service.EVENTS.path) if isinstance(event_service.EVENTS, CompiledCatalog) else None,
+        "precomputed_narrations": narration_store.count()
     }
 
 
 # AI Event Generation Endpoints
 from app.ai_event_generator import AIEventGenerator
+from app.narration_store import NarrationStore
 
 # Global AI event generator instance
 ai_generator = AIEventGenerator()
+narration_store = NarrationStore()
 summary_service = SummaryService()
 
 @app.post("/events/ai/describe")
@@ -549,6 +776,26 @@ def generate_ai_description(event: GameEvent, game_state: GameInterface):
         "event_name": event.name
     }
 
+@app.post("/events/ai/describe_batch")
+def generate_ai_descriptions_batch(request: EventDescribeBatchRequest):
+    """
+    Generuje opisy AI dla wielu wydarzeń w jednym zapytaniu do modelu.
+    """
+    descriptions = ai_generator.generate_event_descriptions_batch(
+        [(item.event, item.game_state) for item in request.items]
+    )
+    return {
+        "results": [
+            {
+                "event_name": item.event.name,
+                "original_description": item.event.description,
+                "ai_description": description,
+            }
+            for item, description in zip(request.items, descriptions)
+        ],
+        "count": len(descriptions)
+    }
+
 @app.post("/events/ai/variation")
 def generate_event_variation(base_event: Dict[str, Any], game_state: GameInterface):
     """
@@ -571,17 +818,28 @@ def generate_random_event(game_state: GameInterface, event_type: str = "random")
         "game_state": game_state.dict()
     }
 
+def _lookup_narration(event: GameEvent, game_state: GameInterface) -> Optional[str]:
+    """Zwraca prekomputowaną narrację wydarzenia albo None."""
+    with tracer.span("narration_store.get", event_name=event.name) as span:
+        ai_description = narration_store.get(event.name, game_state)
+        span.set_attribute("cache_hit", ai_description is not None)
+    return ai_description
+
 @app.post("/events/ai/trigger_with_description")
-def trigger_event_with_ai_description(game_state: GameInterface):
+@profiled
+def trigger_event_with_ai_description(game_state: GameInterface, game_id: Optional[str] = None):
     """
     Wyzwala wydarzenie i generuje AI opis.
     """
     # Najpierw wyzwól wydarzenie
-    event_result = event_service.choose_event(game_state)
+    event_result = event_service.choose_event(game_state, game_id)
     
     if event_result.event_occurred and event_result.event:
-        # Generuj AI opis
-        ai_description = ai_generator.generate_event_description(event_result.event, game_state)
+        # Najpierw prekomputowana narracja, AI tylko przy chybieniu
+        ai_description = _lookup_narration(event_result.event, game_state)
+        from_store = ai_description is not None
+        if not from_store:
+            ai_description = ai_generator.generate_event_description(event_result.event, game_state)
         
         return {
             "event_occurred": True,
@@ -589,14 +847,147 @@ def trigger_event_with_ai_description(game_state: GameInterface):
             "updated_game_state": event_result.updated_game_state,
             "original_description": event_result.event.description,
             "ai_description": ai_description,
+            "ai_description_cached": from_store,
             "message": f"Wydarzenie: {event_result.event.name} - {ai_description}"
         }
     
     return event_result
 
+def _resolve_summary_history(game_state: GameSummaryRequest) -> GameSummaryRequest:
+    """
+    Uzupełnia historię z magazynu sesji, jeśli podano game_id.
+    """
+    if game_state.game_id:
+        entries = [
+            GameHistory.model_validate_json(entry)
+            for entry in _session_history(game_state.game_id, game_state.choice, game_state.turn)
+        ]
+        game_state = game_state.model_copy(update={
+            "history": GameHistory(options=[option for entry in entries for option in entry.options])
+        })
+    elif game_state.history is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either history or game_id is required"
+        )
+    return game_state
+
 @app.post("/summary")
-def get_summary(game_state: GameSummaryRequest) -> GameSummaryResponse:
+@profiled
+async def get_summary(game_state: GameSummaryRequest, request: Request) -> GameSummaryResponse:
     """
     Zwraca podsumowanie gry.
+    Generowanie jest przerywane, gdy klient się rozłączy lub minie REQUEST_TIMEOUT_S.
+    """
+    resolved = await run_in_threadpool(_resolve_summary_history, game_state)
+    summary = await run_cancellable(request, summary_service.getGameSummaryAsync(resolved))
+    if game_state.game_id and game_state.choice:
+        await run_in_threadpool(_record_choice, game_state.game_id, game_state.choice, game_state.turn)
+    return summary
+
+
+# Game Session Endpoints
+@app.post("/sessions")
+def create_session():
+    """
+    Tworzy nową sesję gry - klient wysyła potem tylko game_id i ostatni wybór.
+    """
+    game_id = uuid.uuid4().hex
+    session_store.create(game_id)
+    return {"game_id": game_id}
+
+@app.get("/sessions/{game_id}")
+def get_session(game_id: str):
+    """
+    Zwraca historię wyborów zapisaną dla sesji gry.
+    """
+    with _session_errors(game_id):
+        history = session_store.history(game_id)
+    return {
+        "game_id": game_id,
+        "history": history,
+        "count": len(history)
+    }
+
+@app.delete("/sessions/{game_id}")
+def delete_session(game_id: str):
+    """
+    Usuwa sesję gry.
+    """
+    session_store.delete(game_id)
+    event_service.forget_session(game_id)
+    return {"message": "Sesja została usunięta", "game_id": game_id}
+
+
+# WebSocket Game Channel
+from app.ws_channel import GameChannel, ChannelContext
+from app.schemas import ChannelEventRequest, ChannelSimulateRequest, EventDescribeItem
+
+game_channel = GameChannel(max_in_flight=int(os.getenv("WS_MAX_IN_FLIGHT", "16")))
+
+@game_channel.operation("events.trigger", ChannelEventRequest)
+def ws_trigger_event(payload: ChannelEventRequest):
+    return event_service.choose_event(payload.game_state, payload.game_id)
+
+@game_channel.operation("events.available", ChannelEventRequest)
+def ws_available_events(payload: ChannelEventRequest):
+    return get_available_events(payload.game_state, payload.game_id)
+
+@game_channel.operation("events.simulate", ChannelSimulateRequest)
+def ws_simulate_events(payload: ChannelSimulateRequest):
+    return simulate_events(payload.game_state, payload.num_events, payload.game_id)
+
+@game_channel.operation("events.ai.describe", EventDescribeItem)
+def ws_describe_event(payload: EventDescribeItem):
+    return generate_ai_description(payload.event, payload.game_state)
+
+@game_channel.operation("events.ai.describe_batch", EventDescribeBatchRequest)
+def ws_describe_events_batch(payload: EventDescribeBatchRequest):
+    return generate_ai_descriptions_batch(payload)
+
+@game_channel.operation("events.ai.trigger_with_description", ChannelEventRequest)
+async def ws_trigger_with_description(payload: ChannelEventRequest, ctx: ChannelContext):
+    """
+    Wynik wydarzenia wraca od razu; opis AI (gdy nie ma go w magazynie)
+    jest dosyłany jako push "ai_description".
+    """
+    event_result = await run_in_threadpool(event_service.choose_event, payload.game_state, payload.game_id)
+    if not (event_result.event_occurred and event_result.event):
+        return event_result
+
+    event = event_result.event
+    ai_description = await run_in_threadpool(_lookup_narration, event, payload.game_state)
+    if ai_description is None:
+        async def push_description():
+            # Wersja async - rozłączenie klienta przerywa też zapytanie do AI
+            description = await ai_generator.agenerate_event_description(event, payload.game_state)
+            await ctx.push("ai_description", {"event_name": event.name, "ai_description": description})
+        ctx.spawn(push_description())
+
+    return {
+        "event_occurred": True,
+        "event": event,
+        "updated_game_state": event_result.updated_game_state,
+        "original_description": event.description,
+        "ai_description": ai_description,
+        "ai_description_cached": ai_description is not None,
+        "ai_description_pending": ai_description is None,
+        "message": f"Wydarzenie: {event.name} - {ai_description or event.description}"
+    }
+
+@game_channel.operation("generate_year", GenerateYearRequest)
+async def ws_generate_year(payload: GenerateYearRequest, ctx: ChannelContext):
+    # Bez requestu HTTP pilnowany jest tylko limit czasu; rozłączenie anuluje zadanie
+    return await generate_year(payload, None)
+
+@game_channel.operation("summary", GameSummaryRequest)
+async def ws_summary(payload: GameSummaryRequest, ctx: ChannelContext):
+    return await get_summary(payload, None)
+
+@app.websocket("/ws")
+async def game_websocket(websocket: WebSocket):
+    """
+    Kanał gry: te same operacje co endpointy HTTP, jako wiadomości
+    {"id", "op", "payload"} po jednym długotrwałym połączeniu.
     """
-    return summary_service.getGameSummary(game_state)
+    await game_channel.serve(websocket)
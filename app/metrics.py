@@ -0,0 +1,27 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """Proste, bezpieczne wątkowo liczniki procesu (wystawiane pod /metrics)."""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+
+# Globalny rejestr liczników
+metrics = Metrics()
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence, Tuple
+
+from app.metrics import metrics
+
+# Lokalny zastępca modelu - wywołujący przechodzą na swoje deterministyczne fallbacki
+LOCAL_MODEL = "local"
+
+# Poziomy modeli, od najszybszego/najtańszego do najlepszego
+TIERS = {
+    "fast": os.getenv("MODEL_TIER_FAST", "gemini-2.5-flash-lite"),
+    "quality": os.getenv("MODEL_TIER_QUALITY", "gemini-2.5-flash"),
+    "local": LOCAL_MODEL,
+}
+
+# Współczynnik wygładzania średnich kroczących
+EWMA_ALPHA = 0.2
+# Powyżej tego odsetka błędów model uznajemy za niezdrowy
+MAX_ERROR_RATE = 0.3
+# Co ile sekund niezdrowy model dostaje jedno zapytanie próbne
+PROBE_INTERVAL_S = 30.0
+
+
+class LocalModelFallback(RuntimeError):
+    """Routing wybrał lokalnego zastępcę - wywołujący powinien użyć swojego fallbacku."""
+
+
+class RoutePolicy:
+    """Preferowane poziomy modeli (w kolejności) i budżet latencji endpointu."""
+
+    def __init__(self, tiers: Sequence[str], budget_s: float):
+        self.tiers = tuple(tiers)
+        self.budget_s = budget_s
+
+    def info(self) -> Dict:
+        return {"tiers": list(self.tiers), "models": [TIERS[t] for t in self.tiers], "budget_s": self.budget_s}
+
+
+# Gracz czeka: szybki poziom; praca w tle lub odrzucana: tańsze poziomy i fallback lokalny
+DEFAULT_ROUTES = {
+    "generate_year": RoutePolicy(("fast",), 4.0),
+    "generate_year.speculative": RoutePolicy(("fast",), 10.0),
+    "summary": RoutePolicy(("quality", "fast"), 15.0),
+    "chat": RoutePolicy(("fast",), 8.0),
+    "chat.compaction": RoutePolicy(("fast", "local"), 15.0),
+    "events.describe": RoutePolicy(("fast", "local"), 3.0),
+    # Jedno zapytanie opisuje do MAX_DESCRIBE_BATCH wydarzeń - odpowiedź kilka razy dłuższa
+    "events.describe_batch": RoutePolicy(("fast", "local"), 12.0),
+    "events.variation": RoutePolicy(("fast", "local"), 5.0),
+    "events.generate": RoutePolicy(("fast", "local"), 5.0),
+    "default": RoutePolicy(("fast",), 10.0),
+}
+
+
+class ModelStats:
+    """Obserwowana latencja i odsetek błędów modelu na danej trasie."""
+
+    def __init__(self):
+        self.latency_s: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.last_observed = 0.0
+
+    def info(self) -> Dict:
+        return {
+            "latency_ewma_s": round(self.latency_s, 3) if self.latency_s is not None else None,
+            "error_rate_ewma": round(self.error_rate, 3),
+            "calls": self.calls,
+        }
+
+
+class ModelRouter:
+    """
+    Dobiera model dla endpointu: pierwszy poziom z polityki, który mieści się
+    w budżecie latencji, nie ma zbyt wielu błędów i nie jest przeciążony.
+    W przeciwnym razie schodzi na kolejny (szybszy/tańszy/lokalny) poziom.
+    Latencja i błędy liczone są osobno dla każdej pary (trasa, model) - trasy
+    mają bardzo różne długości wywołań; przeciążenie to liczba zapytań w toku
+    dla całego modelu.
+    """
+
+    def __init__(self, routes: Dict[str, RoutePolicy] = None, max_in_flight: int = 32):
+        self.routes = dict(routes or DEFAULT_ROUTES)
+        self.max_in_flight = max_in_flight
+        self._stats: Dict[Tuple[str, str], ModelStats] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def policy(self, route: str) -> RoutePolicy:
+        return self.routes.get(route) or self.routes["default"]
+
+    def choose(self, route: str) -> str:
+        policy = self.policy(route)
+        now = time.monotonic()
+        with self._lock:
+            chosen = TIERS[policy.tiers[-1]]
+            for tier in policy.tiers:
+                model = TIERS[tier]
+                if model == LOCAL_MODEL or self._healthy(route, model, policy.budget_s, now):
+                    chosen = model
+                    break
+
+        metrics.inc(f"model_router.{route}.{chosen}")
+        if chosen != TIERS[policy.tiers[0]]:
+            metrics.inc(f"model_router.{route}.downgraded")
+        return chosen
+
+    def _healthy(self, route: str, model: str, budget_s: float, now: float) -> bool:
+        if self._in_flight.get(model, 0) >= self.max_in_flight:
+            return False
+        stats = self._stats.get((route, model))
+        if stats is None or stats.latency_s is None:
+            return True
+        if stats.latency_s <= budget_s and stats.error_rate < MAX_ERROR_RATE:
+            return True
+        # Niezdrowy model co jakiś czas dostaje zapytanie próbne, żeby mógł wrócić
+        if now - stats.last_observed >= PROBE_INTERVAL_S:
+            stats.last_observed = now
+            return True
+        return False
+
+    @contextmanager
+    def track(self, model: str, route: Optional[str] = None):
+        """
+        Mierzy wywołanie modelu (latencja, błąd, liczba zapytań w toku).
+        Anulowanie (rozłączenie klienta, limit czasu, porzucony strumień) nie jest
+        błędem modelu - zwalnia tylko licznik zapytań w toku.
+        """
+        key = (route or "default", model)
+        with self._lock:
+            self._in_flight[model] = self._in_flight.get(model, 0) + 1
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self._observe(key, time.perf_counter() - started, ok=False)
+            raise
+        except BaseException:
+            self._release(model)
+            raise
+        else:
+            self._observe(key, time.perf_counter() - started, ok=True)
+
+    def _release(self, model: str) -> None:
+        with self._lock:
+            self._in_flight[model] -= 1
+
+    def _observe(self, key: Tuple[str, str], latency: float, ok: bool) -> None:
+        route, model = key
+        with self._lock:
+            self._in_flight[model] -= 1
+            stats = self._stats.setdefault(key, ModelStats())
+            stats.calls += 1
+            stats.last_observed = time.monotonic()
+            stats.latency_s = latency if stats.latency_s is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * stats.latency_s
+            )
+            stats.error_rate = EWMA_ALPHA * (0.0 if ok else 1.0) + (1 - EWMA_ALPHA) * stats.error_rate
+        if not ok:
+            metrics.inc(f"model_router.errors.{model}")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            routes = {route: policy.info() for route, policy in self.routes.items()}
+            for (route, model), stats in self._stats.items():
+                routes.setdefault(route, {}).setdefault("stats", {})[model] = stats.info()
+            return {
+                "models": {model: {"in_flight": count} for model, count in self._in_flight.items()},
+                "routes": routes,
+            }
+
+
+def create_model_router() -> ModelRouter:
+    """
+    Tworzy router; MODEL_ROUTES (JSON) nadpisuje polityki, np.
+    {"summary": {"tiers": ["fast"], "budget_s": 8}}.
+    """
+    routes = dict(DEFAULT_ROUTES)
+    for route, policy in json.loads(os.getenv("MODEL_ROUTES", "{}")).items():
+        routes[route] = RoutePolicy(policy["tiers"], float(policy["budget_s"]))
+    return ModelRouter(routes, max_in_flight=int(os.getenv("MODEL_MAX_IN_FLIGHT", "32")))
+
+
+# Globalny router procesu
+model_router = create_model_router()
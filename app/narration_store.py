@@ -0,0 +1,144 @@
+import argparse
+import bisect
+import random
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, List, Tuple
+
+from app.schemas import GameInterface, GameEvent, EventType
+
+NARRATIONS_FILE = Path(__file__).parent / "events/narrations.sqlite"
+
+# Progi kubełków stanu gry - opis zależy tylko od zgrubnego stanu
+HEALTH_BANDS = (30, 70)
+MONEY_BANDS = (1000, 10000, 50000)
+RELATIONS_BANDS = (30, 70)
+
+# Reprezentatywne wartości dla każdego kubełka (używane przy budowaniu)
+HEALTH_VALUES = (15, 50, 85)
+MONEY_VALUES = (500, 5000, 25000, 150000)
+RELATIONS_VALUES = (15, 50, 85)
+
+
+def state_bucket(game_state: GameInterface) -> str:
+    """Zwraca klucz kubełka (pasma zdrowia/pieniędzy/relacji) dla stanu gry."""
+    health = bisect.bisect_right(HEALTH_BANDS, game_state.health)
+    money = bisect.bisect_right(MONEY_BANDS, game_state.money)
+    relations = bisect.bisect_right(RELATIONS_BANDS, game_state.relations)
+    return f"h{health}m{money}r{relations}"
+
+
+def representative_states() -> List[GameInterface]:
+    """Zwraca po jednym reprezentatywnym stanie gry dla każdego kubełka."""
+    return [
+        GameInterface(
+            money=money,
+            health=health,
+            relations=relations,
+            satisfaction=50,
+            passive_income=0,
+            married=False,
+        )
+        for health in HEALTH_VALUES
+        for money in MONEY_VALUES
+        for relations in RELATIONS_VALUES
+    ]
+
+
+class NarrationStore:
+    """
+    Tylko-do-odczytu magazyn prekomputowanych narracji (SQLite).
+    Brak pliku oznacza pusty magazyn - każde zapytanie jest chybione.
+    """
+
+    def __init__(self, path: Path = NARRATIONS_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.path.exists():
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._conn.execute("PRAGMA mmap_size = 67108864")
+
+    def get(self, event_name: str, game_state: GameInterface, rng: random.Random = None) -> Optional[str]:
+        """Zwraca losowy wariant narracji dla wydarzenia i stanu gry albo None."""
+        if self._conn is None:
+            return None
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT description FROM narrations WHERE event = ? AND bucket = ?",
+                (event_name, state_bucket(game_state)),
+            ).fetchall()
+
+        if not rows:
+            return None
+        return (rng or random).choice(rows)[0]
+
+    def count(self) -> int:
+        if self._conn is None:
+            return 0
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM narrations").fetchone()[0]
+
+
+def build_store(path: Path = NARRATIONS_FILE, variants: int = 3) -> int:
+    """
+    Prekomputuje narracje dla wszystkich wydarzeń z event.json i wszystkich
+    kubełków stanu gry. Zwraca liczbę zapisanych narracji.
+    """
+    from app.ai_event_generator import AIEventGenerator
+    from app.event_service import EventService
+
+    generator = AIEventGenerator()
+    states = representative_states()
+    items: List[Tuple[GameEvent, GameInterface]] = []
+    for event in EventService().EVENTS:
+        # Warunki nie wpływają na narrację, a nie wszystkie pasują do EventCondition
+        game_event = GameEvent(
+            name=event["name"],
+            type=EventType(event["type"]),
+            description=event["description"],
+            conditions={},
+            effects=event["effects"],
+            chance=event["chance"],
+        )
+        items.extend((game_event, state) for state in states)
+
+    path = Path(path)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.unlink(missing_ok=True)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute(
+        "CREATE TABLE narrations ("
+        "event TEXT NOT NULL, bucket TEXT NOT NULL, variant INTEGER NOT NULL, description TEXT NOT NULL, "
+        "PRIMARY KEY (event, bucket, variant)) WITHOUT ROWID"
+    )
+
+    stored = 0
+    for variant in range(variants):
+        descriptions = generator.generate_event_descriptions_batch(items)
+        rows = [
+            (event.name, state_bucket(state), variant, description)
+            for (event, state), description in zip(items, descriptions)
+            # Opis bazowy oznacza błąd AI - lepiej zostawić chybienie
+            if description != event.description
+        ]
+        conn.executemany("INSERT INTO narrations VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+        stored += len(rows)
+        print(f"Wariant {variant + 1}/{variants}: zapisano {len(rows)}/{len(items)} narracji")
+
+    conn.execute("VACUUM")
+    conn.close()
+    tmp_path.replace(path)
+    return stored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Buduje magazyn prekomputowanych narracji wydarzeń")
+    parser.add_argument("--output", type=Path, default=NARRATIONS_FILE)
+    parser.add_argument("--variants", type=int, default=3)
+    args = parser.parse_args()
+    total = build_store(args.output, args.variants)
+    print(f"Gotowe: {total} narracji w {args.output}")
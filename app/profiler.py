@@ -0,0 +1,190 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Maksymalna głębokość zbieranego stosu
+MAX_STACK_DEPTH = 128
+
+_UNBOUND = object()
+
+_current_profile: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("current_profile", default=None)
+
+
+class Profile:
+    """
+    Próbkowany profil jednego requestu - stosy w formacie "folded" (flamegraph).
+    Próbka trafia do profilu tylko wtedy, gdy w danej chwili wykonuje się kod
+    tego requestu: jego zadanie w pętli zdarzeń albo wątek z puli, w którym
+    działa jego synchroniczny endpoint. Czas oczekiwania na I/O nie jest próbkowany.
+    """
+
+    def __init__(self, profile_id: int, method: str, path: str):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        # id wątku -> (pętla, zadanie) dla kodu async albo None dla wątku z puli
+        self.bindings: Dict[int, Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Task]]] = {}
+        self.samples: Counter = Counter()
+
+    def bind_task(self) -> None:
+        """Przypisuje do profilu bieżące zadanie pętli zdarzeń."""
+        self.bindings[threading.get_ident()] = (asyncio.get_running_loop(), asyncio.current_task())
+
+    def owns(self, thread_id: int) -> bool:
+        """Czy wątek wykonuje właśnie kod tego requestu (wołane z wątku próbkującego)."""
+        binding = self.bindings.get(thread_id, _UNBOUND)
+        if binding is _UNBOUND:
+            return False
+        if binding is None:
+            return True
+        loop, task = binding
+        return asyncio.current_task(loop) is task
+
+    def folded(self) -> str:
+        """Zwraca profil w formacie "ramka;ramka;ramka liczba" (flamegraph.pl, speedscope)."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+    def info(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "samples": sum(self.samples.values()),
+        }
+
+
+def _fold_stack(frame) -> str:
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class SamplingProfiler:
+    """
+    Próbkujący profiler requestów. Wątek próbkujący działa tylko gdy trwa
+    jakiś profilowany request; zachowywane są profile wymuszone nagłówkiem
+    oraz te, które przekroczyły próg latencji. Współbieżne requesty dzielą
+    wątek pętli zdarzeń - próbki są przypisywane po aktualnie wykonywanym zadaniu.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, slow_ms: float = 2000, interval_ms: float = 5, buffer_size: int = 50):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.interval = interval_ms / 1000
+        self.profiles: Deque[Profile] = deque(maxlen=buffer_size)
+        self._active: Dict[int, Profile] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def should_profile(self, forced: bool) -> bool:
+        return forced or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def start(self, method: str, path: str) -> Profile:
+        """Rozpoczyna profil requestu i wiąże z nim bieżące zadanie pętli zdarzeń."""
+        profile = Profile(next(self._ids), method, path)
+        profile.bind_task()
+        _current_profile.set(profile)
+        with self._lock:
+            self._active[profile.id] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return profile
+
+    def stop(self, profile: Profile, duration_ms: float, forced: bool) -> bool:
+        """Kończy profil; zwraca True jeśli został zachowany w buforze."""
+        profile.duration_ms = duration_ms
+        with self._lock:
+            self._active.pop(profile.id, None)
+            keep = forced or duration_ms >= self.slow_ms
+            if keep:
+                self.profiles.append(profile)
+        return keep
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        with self._lock:
+            return next((p for p in self.profiles if p.id == profile_id), None)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [p.info() for p in self.profiles]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = list(self._active.values())
+            frames = sys._current_frames()
+            for profile in active:
+                for thread_id in list(profile.bindings):
+                    frame = frames.get(thread_id)
+                    if frame is not None and profile.owns(thread_id):
+                        profile.samples[_fold_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+def profiled(func):
+    """
+    Dekorator endpointu: wiąże z profilem bieżącego requestu zadanie, w którym
+    wykonuje się endpoint async (middleware wywołuje aplikację w osobnym
+    zadaniu), albo wątek z puli, w którym wykonuje się endpoint synchroniczny.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            profile = _current_profile.get()
+            if profile is not None:
+                profile.bind_task()
+            return await func(*args, **kwargs)
+
+        async_wrapper.__signature__ = inspect.signature(func, eval_str=True)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        thread_id = threading.get_ident()
+        profile.bindings[thread_id] = None
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.bindings.pop(thread_id, None)
+
+    # Adnotacje jako typy, bo FastAPI rozwiązałby napisy w globalach tego modułu
+    wrapper.__signature__ = inspect.signature(func, eval_str=True)
+    return wrapper
+
+
+def create_profiler() -> SamplingProfiler:
+    return SamplingProfiler(
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        slow_ms=float(os.getenv("PROFILE_SLOW_MS", "2000")),
+        interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+        buffer_size=int(os.getenv("PROFILE_BUFFER_SIZE", "50")),
+    )
+
+
+# Globalny profiler procesu
+profiler = create_profiler()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 from enum import Enum
 
@@ -80,8 +80,13 @@ class AIEventRequest(BaseModel):
     events_data: List[Dict[str, Any]]
 
 class GameSummaryRequest(BaseModel):
-    history: GameHistory
     game_state: GameInterface
+    history: Optional[GameHistory] = None
+    # Zamiast pełnej historii: identyfikator sesji i ostatni wybór
+    game_id: Optional[str] = None
+    choice: Optional[GameHistory] = None
+    # Numer tury wyboru (pozycja w historii, od 0) - ponowiony request nie dopisze go drugi raz
+    turn: Optional[int] = None
 
 class GameSummaryResponse(BaseModel):
     summary: str
@@ -93,4 +98,34 @@ class GenerateYearResponse(BaseModel):
 class GenerateYearRequest(BaseModel):
     game_interface: GameInterface
     options_amount: int
-    history: list[GameHistory]
\ No newline at end of file
+    history: list[GameHistory] = []
+    # Zamiast pełnej historii: identyfikator sesji i ostatni wybór
+    game_id: Optional[str] = None
+    choice: Optional[GameHistory] = None
+    # Numer tury wyboru (pozycja w historii, od 0) - ponowiony request nie dopisze go drugi raz
+    turn: Optional[int] = None
+
+class EventDescribeItem(BaseModel):
+    event: GameEvent
+    game_state: GameInterface
+
+# Limit elementów jednego requestu batchowego (kilka wywołań modelu po 10 wydarzeń)
+MAX_DESCRIBE_BATCH_ITEMS = 50
+
+class EventDescribeBatchRequest(BaseModel):
+    items: List[EventDescribeItem] = Field(max_length=MAX_DESCRIBE_BATCH_ITEMS)
+
+class EventDescription(BaseModel):
+    index: int
+    description: str
+
+class EventDescriptionBatch(BaseModel):
+    descriptions: List[EventDescription]
+
+
+class ChannelEventRequest(BaseModel):
+    game_state: GameInterface
+    game_id: Optional[str] = None
+
+class ChannelSimulateRequest(ChannelEventRequest):
+    num_events: int = 5
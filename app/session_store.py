@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional
+
+from app.metrics import metrics
+from app.schemas import GameHistory
+
+
+class SessionNotFound(KeyError):
+    """Sesja o podanym game_id nie istnieje (nie została utworzona albo wygasła)."""
+
+
+class SessionConflict(ValueError):
+    """Numer tury nie pasuje do zapisanej historii sesji."""
+
+
+def check_turn(entries: List[str], entry: str, turn: Optional[int]) -> bool:
+    """
+    Sprawdza, czy wybór (JSON) z danym numerem tury trzeba dopisać. Powtórzony
+    zapis tej samej tury (np. ponowienie requestu przez klienta) jest pomijany.
+    """
+    return _turn_needed(len(entries), lambda: entries[turn], entry, turn)
+
+
+def _turn_needed(length: int, stored_at_turn, entry: str, turn: Optional[int]) -> bool:
+    if turn is None or turn == length:
+        return True
+    if 0 <= turn < length and stored_at_turn() == entry:
+        return False
+    raise SessionConflict(f"Turn {turn} does not match session history of length {length}")
+
+
+class SessionStore(ABC):
+    """
+    Bazowa klasa magazynu sesji gry - dopisywany log wyborów gracza
+    kluczowany identyfikatorem gry.
+    """
+
+    @abstractmethod
+    def create(self, game_id: str) -> None:
+        """Rejestruje nową, pustą sesję."""
+
+    @abstractmethod
+    def append(self, game_id: str, entry: GameHistory, turn: Optional[int] = None) -> bool:
+        """
+        Dopisuje wybór; z numerem tury zapis jest idempotentny. Zwraca False,
+        gdy ta tura była już zapisana.
+        """
+
+    @abstractmethod
+    def history_json(self, game_id: str) -> List[str]:
+        """
+        Zwraca historię sesji jako surowy JSON wpisów (bez walidacji - wystarcza
+        do promptu); SessionNotFound dla nieznanego game_id.
+        """
+
+    def history(self, game_id: str) -> List[GameHistory]:
+        """Zwraca zwalidowaną historię sesji."""
+        return [GameHistory.model_validate_json(entry) for entry in self.history_json(game_id)]
+
+    @abstractmethod
+    def delete(self, game_id: str) -> None:
+        ...
+
+
+class _Session:
+    def __init__(self):
+        # Wpisy trzymane jako JSON - nie są walidowane ani serializowane przy każdej turze
+        self.entries: List[str] = []
+        self.last_used = time.monotonic()
+
+
+class InMemorySessionStore(SessionStore):
+    """Magazyn sesji w pamięci procesu (domyślny); nieużywane sesje są usuwane (LRU + TTL)."""
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 86400.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, game_id: str) -> None:
+        with self._lock:
+            self._evict_expired()
+            self._sessions[game_id] = _Session()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                metrics.inc("sessions.evicted_lru")
+
+    def append(self, game_id: str, entry: GameHistory, turn: Optional[int] = None) -> bool:
+        with self._lock:
+            session = self._get(game_id)
+            entry_json = entry.model_dump_json()
+            if not check_turn(session.entries, entry_json, turn):
+                return False
+            session.entries.append(entry_json)
+            return True
+
+    def history_json(self, game_id: str) -> List[str]:
+        with self._lock:
+            return list(self._get(game_id).entries)
+
+    def delete(self, game_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(game_id, None)
+
+    def _get(self, game_id: str) -> _Session:
+        """Zwraca sesję i odświeża jej pozycję LRU (wywoływać pod blokadą)."""
+        self._evict_expired()
+        session = self._sessions.get(game_id)
+        if session is None:
+            raise SessionNotFound(game_id)
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(game_id)
+        return session
+
+    def _evict_expired(self) -> None:
+        # Wygasłe sesje są na początku kolejki LRU
+        now = time.monotonic()
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            metrics.inc("sessions.evicted_ttl")
+
+
+class SQLiteSessionStore(SessionStore):
+    """Magazyn sesji w osadzonej bazie SQLite - przeżywa restart serwera; sesje wygasają po TTL."""
+
+    def __init__(self, path: str, ttl: float = 86400.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_log ("
+            "game_id TEXT NOT NULL, seq INTEGER NOT NULL, entry TEXT NOT NULL, "
+            "PRIMARY KEY (game_id, seq))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (game_id TEXT PRIMARY KEY, last_used REAL NOT NULL)"
+        )
+        # Bazy sprzed tabeli sessions: istniejące logi stają się sesjami
+        self._conn.execute(
+            "INSERT OR IGNORE INTO sessions (game_id, last_used) SELECT DISTINCT game_id, ? FROM session_log",
+            (time.time(),),
+        )
+        self._conn.commit()
+
+    def create(self, game_id: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM session_log WHERE game_id IN (SELECT game_id FROM sessions WHERE last_used < ?)",
+                (now - self.ttl,),
+            )
+            expired = self._conn.execute(
+                "DELETE FROM sessions WHERE last_used < ?", (now - self.ttl,)
+            ).rowcount
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (game_id, last_used) VALUES (?, ?)", (game_id, now)
+            )
+            self._conn.commit()
+        if expired:
+            metrics.inc("sessions.evicted_ttl", expired)
+
+    def append(self, game_id: str, entry: GameHistory, turn: Optional[int] = None) -> bool:
+        entry_json = entry.model_dump_json()
+        with self._lock:
+            self._touch(game_id)
+            # Długość i ewentualny wpis danej tury czytamy w SQL - bez wczytywania całej historii
+            length = self._conn.execute(
+                "SELECT COUNT(*) FROM session_log WHERE game_id = ?", (game_id,)
+            ).fetchone()[0]
+            try:
+                needed = _turn_needed(length, lambda: self._entry_at(game_id, turn), entry_json, turn)
+            finally:
+                self._conn.commit()
+            if not needed:
+                return False
+            self._conn.execute(
+                "INSERT INTO session_log (game_id, seq, entry) VALUES (?, ?, ?)",
+                (game_id, length, entry_json),
+            )
+            self._conn.commit()
+            return True
+
+    def history_json(self, game_id: str) -> List[str]:
+        with self._lock:
+            self._touch(game_id)
+            rows = self._conn.execute(
+                "SELECT entry FROM session_log WHERE game_id = ? ORDER BY seq", (game_id,)
+            ).fetchall()
+            self._conn.commit()
+        return [row[0] for row in rows]
+
+    def delete(self, game_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM session_log WHERE game_id = ?", (game_id,))
+            self._conn.execute("DELETE FROM sessions WHERE game_id = ?", (game_id,))
+            self._conn.commit()
+
+    def _entry_at(self, game_id: str, seq: int) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT entry FROM session_log WHERE game_id = ? AND seq = ?", (game_id, seq)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _touch(self, game_id: str) -> None:
+        """Odświeża last_used sesji; SessionNotFound, gdy nie istnieje lub wygasła (wywoływać pod blokadą)."""
+        now = time.time()
+        touched = self._conn.execute(
+            "UPDATE sessions SET last_used = ? WHERE game_id = ? AND last_used >= ?",
+            (now, game_id, now - self.ttl),
+        ).rowcount
+        if not touched:
+            self._conn.rollback()
+            raise SessionNotFound(game_id)
+
+
+def create_session_store() -> SessionStore:
+    """
+    Tworzy magazyn sesji na podstawie zmiennych środowiskowych:
+    SESSION_STORE=memory|sqlite, SESSION_DB_PATH=ścieżka do pliku bazy,
+    SESSION_TTL_S=czas życia nieużywanej sesji, SESSION_MAX_SESSIONS=limit sesji w pamięci.
+    """
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    ttl = float(os.getenv("SESSION_TTL_S", "86400"))
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.sqlite"), ttl=ttl)
+    if backend != "memory":
+        raise ValueError(f"Unknown SESSION_STORE backend: {backend}")
+    return InMemorySessionStore(max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")), ttl=ttl)
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from app.metrics import metrics
+from app.schemas import GameInterface, GameHistory, GameOption, GenerateYearResponse, Currency
+
+# Skala walut przy ocenie "atrakcyjności" opcji dla gracza
+CURRENCY_SCALE = {
+    Currency.MONEY: 1000,
+    Currency.PASSIVE_INCOME: 100,
+}
+
+# Historia gry przekazywana jako lista wpisów GameHistory w JSON
+GenerateFn = Callable[[GameInterface, List[str], int], Awaitable[dict]]
+
+
+def choice_key(choice: GameHistory) -> str:
+    return hashlib.sha1(choice.model_dump_json().encode()).hexdigest()
+
+
+def state_key(game_state: GameInterface) -> str:
+    return hashlib.sha1(game_state.model_dump_json().encode()).hexdigest()
+
+
+def project_state(game_state: GameInterface, option: GameOption) -> GameInterface:
+    """Przewiduje stan gry po wybraniu opcji (koszt + efekty, +5 lat)."""
+    changes = {}
+    for currency, amount in [(option.currency, -option.price)] + [(r.currency, r.amount) for r in option.results]:
+        if currency == Currency.EDUCATION:
+            continue
+        changes[currency.value] = changes.get(currency.value, 0) + amount
+
+    update = {}
+    for stat_name, change in changes.items():
+        value = getattr(game_state, stat_name) + change
+        if stat_name == Currency.HEALTH.value:
+            value = max(0, min(100, value))
+        update[stat_name] = value
+    if game_state.age is not None:
+        update["age"] = game_state.age + 5
+    if option.is_work_related and option.job_name:
+        update["job"] = option.job_name
+    if option.degree:
+        update["education"] = option.degree
+    return game_state.model_copy(update=update)
+
+
+def rank_options(options: List[GameOption]) -> List[GameOption]:
+    """Sortuje opcje od najbardziej prawdopodobnego wyboru gracza (najlepszy bilans)."""
+    def score(option: GameOption) -> float:
+        gain = sum(r.amount / CURRENCY_SCALE.get(r.currency, 1) for r in option.results)
+        return gain - option.price / CURRENCY_SCALE.get(option.currency, 1)
+    return sorted(options, key=score, reverse=True)
+
+
+class _Speculation:
+    """Zadanie spekulacji z hashem przewidzianego stanu gry."""
+
+    def __init__(self, state: str):
+        self.state = state
+        self.created = time.monotonic()
+        self.started = False
+        self.task: Optional[asyncio.Task] = None
+
+
+class SpeculativeCache:
+    """
+    Spekulatywne generowanie opcji następnej tury. Po odpowiedzi /generate_year
+    w tle liczone są opcje dla najbardziej prawdopodobnych wyborów gracza;
+    wyniki trzymane są w ograniczonym cache z TTL, kluczowanym (game_id, wybór)
+    i ważnym tylko dla stanu gry, dla którego zostały policzone.
+    Spekulacje są zadaniami asyncio - anulowanie przerywa też zapytanie do modelu.
+    Metody wywołuje się z pętli zdarzeń.
+    """
+
+    def __init__(self, top_k: int = 2, ttl: float = 300.0, max_entries: int = 256, max_concurrency: int = 4):
+        self.top_k = top_k
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._entries: "OrderedDict[Tuple[str, str, int], _Speculation]" = OrderedDict()
+
+    def speculate(self, game_id: str, game_state: GameInterface, history: List[str],
+                  response: GenerateYearResponse, options_amount: int, generate: GenerateFn) -> None:
+        """Uruchamia w tle generowanie następnej tury dla top_k opcji."""
+        # Nowa tura unieważnia spekulacje poprzedniej
+        self._discard(lambda key: key[0] == game_id)
+
+        for option in rank_options(response.options)[:self.top_k]:
+            choice = GameHistory(options=[option])
+            projected = project_state(game_state, option)
+            speculation = _Speculation(state_key(projected))
+            speculation.task = asyncio.ensure_future(
+                self._run(speculation, generate, projected, history + [choice.model_dump_json()], options_amount)
+            )
+            metrics.inc("speculation.started")
+            self._entries[(game_id, choice_key(choice), options_amount)] = speculation
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._cancel(evicted)
+
+    async def _run(self, speculation: _Speculation, generate: GenerateFn, game_state: GameInterface,
+                   history: List[str], options_amount: int) -> Optional[dict]:
+        async with self._semaphore:
+            speculation.started = True
+            try:
+                return await generate(game_state, history, options_amount)
+            except Exception as e:
+                print(f"Speculative generation failed: {e}")
+                metrics.inc("speculation.errors")
+                return None
+
+    async def take(self, game_id: str, choice: GameHistory, options_amount: int,
+                   game_state: GameInterface) -> Optional[dict]:
+        """
+        Zwraca wynik spekulacji dla wyboru gracza albo None; pozostałe spekulacje
+        gry są anulowane. Wynik policzony dla innego stanu gry niż przysłany
+        przez klienta (np. po wydarzeniu losowym) nie jest używany.
+        """
+        key = (game_id, choice_key(choice), options_amount)
+        self._discard(lambda k: k[0] != game_id and self._expired(self._entries[k]), "speculation.expired")
+        speculation = self._entries.pop(key, None)
+        self._discard(lambda k: k[0] == game_id)
+
+        if speculation is None or self._expired(speculation) or speculation.state != state_key(game_state):
+            metrics.inc("speculation.misses")
+            if speculation is not None:
+                self._cancel(speculation)
+            return None
+
+        result = await speculation.task
+        if result is None:
+            metrics.inc("speculation.misses")
+            return None
+        metrics.inc("speculation.hits")
+        return result
+
+    def _expired(self, speculation: _Speculation) -> bool:
+        return time.monotonic() - speculation.created > self.ttl
+
+    def _discard(self, predicate, counter: Optional[str] = None) -> None:
+        """Anuluje i usuwa wpisy spełniające predykat."""
+        for key in [k for k in self._entries if predicate(k)]:
+            self._cancel(self._entries.pop(key))
+            if counter:
+                metrics.inc(counter)
+
+    @staticmethod
+    def _cancel(speculation: _Speculation) -> None:
+        """
+        Anuluje spekulację i liczy, ile pracy przepadło: cancelled - nie zdążyła
+        wystartować, aborted - przerwane zapytanie do modelu, wasted - gotowy,
+        nieużyty wynik.
+        """
+        if speculation.task.done():
+            metrics.inc("speculation.wasted")
+        elif speculation.started:
+            speculation.task.cancel()
+            metrics.inc("speculation.aborted")
+        else:
+            speculation.task.cancel()
+            metrics.inc("speculation.cancelled")
+
+
+def create_speculative_cache() -> Optional[SpeculativeCache]:
+    """Tworzy cache spekulacji, jeśli włączono SPECULATIVE_GENERATION=1."""
+    if os.getenv("SPECULATIVE_GENERATION", "0") not in ("1", "true", "yes"):
+        return None
+    return SpeculativeCache(
+        top_k=int(os.getenv("SPECULATIVE_TOP_K", "2")),
+        ttl=float(os.getenv("SPECULATIVE_TTL_S", "300")),
+        max_entries=int(os.getenv("SPECULATIVE_MAX_ENTRIES", "256")),
+    )
@@ -8,6 +8,12 @@ class SummaryService:
         self.gemini = GeminiChat()
 
     def getGameSummary(self, game_state: GameSummaryRequest) -> GameSummaryResponse:
+        return GameSummaryResponse(summary=self.gemini.message(self._build_prompt(game_state), route="summary"))
+
+    async def getGameSummaryAsync(self, game_state: GameSummaryRequest) -> GameSummaryResponse:
+        return GameSummaryResponse(summary=await self.gemini.amessage(self._build_prompt(game_state), route="summary"))
+
+    def _build_prompt(self, game_state: GameSummaryRequest) -> str:
         history_json = game_state.history.model_dump_json()
         game_state_json = game_state.game_state.model_dump_json()
 
@@ -17,6 +23,6 @@ class SummaryService:
         Waluta to polski złoty. Podsumowanie ma miejsce pod koniec gry. Wiec obecny stan gry jest juz po jej zakonczeniu. Zwracaj sie bezposrednio do gracza, typu: podjales dobra decyzje podejmujac prace... itp. (nie pisz w 3 osobie). Pisz ogolnie, nie podawaj szczegolow, np kwot. Na koncu
         nie pisz gratulacji itp."""
 
-        return GameSummaryResponse(summary=self.gemini.message(prompt))
+        return prompt
 
 
@@ -0,0 +1,198 @@
+import atexit
+import contextvars
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class SpanExporter(ABC):
+    """Bazowa klasa eksportera zakończonych spanów."""
+
+    @abstractmethod
+    def export(self, span: Dict[str, Any]) -> None:
+        ...
+
+
+class StdoutExporter(SpanExporter):
+    """Wypisuje spany jako linie JSON na stdout."""
+
+    def export(self, span: Dict[str, Any]) -> None:
+        sys.stdout.write(json.dumps(span, ensure_ascii=False) + "\n")
+
+
+class FileExporter(SpanExporter):
+    """
+    Dopisuje spany jako linie JSON do pliku. Zapis robi wątek w tle przez
+    jeden otwarty uchwyt - export() nie blokuje pętli zdarzeń na I/O.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._run, name="span-file-exporter", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def export(self, span: Dict[str, Any]) -> None:
+        self._queue.put(json.dumps(span, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        """Zapisuje spany z kolejki i zamyka plik."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def _run(self) -> None:
+        while True:
+            line = self._queue.get()
+            if line is None:
+                break
+            self._file.write(line)
+            # Flush dopiero gdy kolejka opustoszeje - seria spanów to jeden zapis
+            if self._queue.empty():
+                self._file.flush()
+        self._file.close()
+
+
+class InMemoryExporter(SpanExporter):
+    """Trzyma spany w pamięci - do testów."""
+
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+
+    def export(self, span: Dict[str, Any]) -> None:
+        self.spans.append(span)
+
+
+class Span:
+    """Pojedynczy odcinek pracy w ramach śladu (trace)."""
+
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._token = None
+        self._start_time = time.time()
+        self._start = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def traceparent(self) -> str:
+        """Nagłówek W3C traceparent wskazujący na ten span."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration_ms = (time.perf_counter() - self._start) * 1000
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self._tracer.exporter.export({
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self._start_time,
+            "duration_ms": round(duration_ms, 3),
+            "attributes": self.attributes,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+        })
+        return False
+
+
+class _NoopSpan:
+    """Span używany gdy tracing jest wyłączony - nic nie robi."""
+
+    recording = False
+    trace_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def traceparent(self) -> Optional[str]:
+        return None
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _parse_traceparent(header: Optional[str]):
+    """Zwraca (trace_id, parent_span_id) z nagłówka W3C traceparent albo (None, None)."""
+    if not header:
+        return None, None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+class Tracer:
+    """
+    Lekki tracer: spany zagnieżdżają się przez contextvars (działa też
+    w puli wątków FastAPI). Bez eksportera zwraca współdzielony NOOP_SPAN.
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes: Any):
+        """Tworzy span podrzędny wobec bieżącego (lub wobec nagłówka traceparent)."""
+        if self.exporter is None:
+            return NOOP_SPAN
+        parent = _current_span.get()
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id, parent_id = _parse_traceparent(traceparent)
+            trace_id = trace_id or secrets.token_hex(16)
+        return Span(self, name, trace_id, parent_id, attributes)
+
+    def current_span(self):
+        return _current_span.get() or NOOP_SPAN
+
+
+def create_tracer() -> Tracer:
+    """
+    Tworzy tracer na podstawie zmiennych środowiskowych:
+    TRACING_EXPORTER=none|stdout|file, TRACING_FILE=ścieżka pliku JSONL.
+    """
+    exporter_name = os.getenv("TRACING_EXPORTER", "none").lower()
+    if exporter_name == "stdout":
+        return Tracer(StdoutExporter())
+    if exporter_name == "file":
+        return Tracer(FileExporter(os.getenv("TRACING_FILE", "traces.jsonl")))
+    return Tracer()
+
+
+# Globalny tracer procesu
+tracer = create_tracer()
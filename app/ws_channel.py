@@ -0,0 +1,139 @@
+import asyncio
+import functools
+import inspect
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, Type
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, ValidationError
+
+from app.content_negotiation import msgpack, packb, unpackb
+from app.metrics import metrics
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ChannelContext:
+    """Kontekst operacji: pozwala dosłać wynik później (push) w tle (spawn)."""
+
+    def __init__(self, request_id: Any, send: Send, tasks: Set[asyncio.Task]):
+        self.request_id = request_id
+        self._send = send
+        self._tasks = tasks
+
+    async def push(self, event: str, data: Any) -> None:
+        await self._send({"id": self.request_id, "type": "push", "event": event, "data": data})
+
+    def spawn(self, work: Awaitable[None]) -> None:
+        """Uruchamia pracę w tle; zostanie anulowana, gdy klient się rozłączy."""
+        task = asyncio.ensure_future(work)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class GameChannel:
+    """
+    Kanał gry po WebSocket (ramki tekstowe JSON albo binarne MessagePack).
+    Klient wysyła {"id", "op", "payload"}, serwer
+    odpowiada {"id", "type": "result" | "error", ...}; operacje wykonują się
+    współbieżnie, a wyniki AI mogą być dosyłane jako {"id", "type": "push"}.
+    Jedno połączenie może mieć najwyżej max_in_flight operacji i prac w tle
+    naraz - kolejne dostają błąd 429.
+    """
+
+    def __init__(self, max_in_flight: int = 16):
+        self.max_in_flight = max_in_flight
+        self._operations: Dict[str, Tuple[Optional[Type[BaseModel]], Callable]] = {}
+
+    def operation(self, name: str, model: Optional[Type[BaseModel]] = None):
+        """Rejestruje operację. Handlery async dostają dodatkowo ChannelContext."""
+        def decorator(handler):
+            self._operations[name] = (model, handler)
+            return handler
+        return decorator
+
+    @property
+    def operations(self):
+        return sorted(self._operations)
+
+    async def serve(self, websocket: WebSocket) -> None:
+        await websocket.accept()
+        send_lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(message: Dict[str, Any], binary: bool = False) -> None:
+            # Odpowiadamy w tym samym formacie co wiadomość klienta
+            async with send_lock:
+                if binary:
+                    await websocket.send_bytes(packb(jsonable_encoder(message)))
+                else:
+                    await websocket.send_json(jsonable_encoder(message))
+
+        try:
+            while True:
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+                # Ramki binarne niosą MessagePack, tekstowe - JSON
+                binary = frame.get("bytes") is not None and msgpack is not None
+                reply = functools.partial(send, binary=binary)
+                try:
+                    message = unpackb(frame["bytes"]) if binary else json.loads(frame.get("text") or "")
+                except Exception:
+                    await reply({"id": None, "type": "error", "ok": False,
+                                 "error": {"status": 400, "detail": "Invalid message"}})
+                    continue
+                if len(tasks) >= self.max_in_flight:
+                    metrics.inc("ws.rejected")
+                    await reply({"id": message.get("id") if isinstance(message, dict) else None,
+                                 "type": "error", "ok": False,
+                                 "error": {"status": 429, "detail": "Too many operations in flight"}})
+                    continue
+                task = asyncio.create_task(self._dispatch(message, reply, tasks))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # Klient zniknął - przerywamy jego niedokończone operacje
+            for task in tasks:
+                task.cancel()
+            metrics.inc("ws.cancelled", len(tasks))
+
+    async def _dispatch(self, message: Any, send: Send, tasks: Set[asyncio.Task]) -> None:
+        request_id = message.get("id") if isinstance(message, dict) else None
+        op = message.get("op") if isinstance(message, dict) else None
+        metrics.inc("ws.messages")
+
+        if op not in self._operations:
+            await send({"id": request_id, "type": "error", "ok": False,
+                        "error": {"status": 404, "detail": f"Unknown operation: {op}"}})
+            return
+
+        model, handler = self._operations[op]
+        payload = message.get("payload") or {}
+
+        try:
+            if model is not None:
+                payload = model.model_validate(payload)
+            if inspect.iscoroutinefunction(handler):
+                result = await handler(payload, ChannelContext(request_id, send, tasks))
+            else:
+                result = await run_in_threadpool(handler, payload)
+        except ValidationError as e:
+            await send({"id": request_id, "type": "error", "ok": False,
+                        "error": {"status": 422, "detail": e.errors(include_url=False, include_context=False)}})
+            return
+        except HTTPException as e:
+            await send({"id": request_id, "type": "error", "ok": False,
+                        "error": {"status": e.status_code, "detail": e.detail}})
+            return
+        except Exception as e:
+            print(f"WebSocket operation {op} failed: {e}")
+            await send({"id": request_id, "type": "error", "ok": False,
+                        "error": {"status": 500, "detail": str(e)}})
+            return
+
+        await send({"id": request_id, "type": "result", "ok": True, "result": result})